@@ -0,0 +1,137 @@
+import sys
+import time
+from svm import SVMWrapper
+from cache import Cache
+from dedup import MinHashDeduplicator
+from golden import GoldenHarness
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+
+def benchmarkOvR(cache, dtype):
+    print("----------------------------------------------")
+    print("SVC vs. parallel one-vs-rest, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    wrapper = SVMWrapper(-1, dtype)
+    wrapper.compareOvR(cache.bestParamsLarge)
+
+
+def benchmarkKernelApproximation(cache, dtype):
+    print("----------------------------------------------")
+    print("exact vs. approximate kernel, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    wrapper = SVMWrapper(-1, dtype)
+    wrapper.compareKernelApproximation(cache.bestParamsLarge)
+
+
+def benchmarkDeduplication(cache, dtype):
+    print("----------------------------------------------")
+    print("with vs. without near duplicate removal, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    #only the training set is deduplicated, both models are scored on the same test set
+    fullWrapper = SVMWrapper(-1, dtype)
+    full = fullWrapper.processDataset(cache.bestParamsLarge, False)
+
+    deduplicator = MinHashDeduplicator()
+    deduplicatedWrapper = SVMWrapper(-1, dtype, deduplicator=deduplicator)
+    deduplicated = deduplicatedWrapper.processDataset(cache.bestParamsLarge, False)
+
+    print("----------------------------------------------")
+    deduplicator.report()
+    print("dataset | training articles | test articles | accuracy | fit time")
+    for name, wrapper, scores in [("full", fullWrapper, full), ("deduplicated", deduplicatedWrapper, deduplicated)]:
+        print(name + " | " + str(len(wrapper.getDataset()[0])) + " | " + str(len(wrapper.getDataset()[1]))
+              + " | " + str(round(scores["accuracy"], 4)) + " | " + str(round(scores["fitTime"], 3)) + "s")
+
+
+def benchmarkPrefetch(cache, dtype):
+    print("----------------------------------------------")
+    print("sequential vs. prefetched dataset preparation, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    results = []
+    for name, prefetch in [("sequential", False), ("prefetch", True)]:
+        start = time.perf_counter()
+        wrapper = SVMWrapper(-1, dtype, prefetch=prefetch)
+        seconds = time.perf_counter() - start
+        results.append((name, wrapper, seconds, wrapper.processDataset(cache.bestParamsLarge, False)))
+
+    print("----------------------------------------------")
+    print("loading | training articles | test articles | preparation time | accuracy")
+    for name, wrapper, seconds, scores in results:
+        print(name + " | " + str(len(wrapper.getDataset()[0])) + " | " + str(len(wrapper.getDataset()[1]))
+              + " | " + str(round(seconds, 3)) + "s | " + str(round(scores["accuracy"], 4)))
+
+
+def benchmarkGolden(cache, dtype):
+    print("----------------------------------------------")
+    print("optimized preprocessing vs. golden reference output: ")
+
+    #records the reference on the first run, checks the engines against it afterwards
+    harness = GoldenHarness(list(cache.words.keys()), dtype=dtype)
+    harness.check()
+
+
+def benchmarkCompact(cache, dtype):
+    print("----------------------------------------------")
+    print("SVC vs. compact quantized model, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    wrapper = SVMWrapper(-1, dtype)
+    wrapper.compareCompact(cache.bestParamsLarge)
+
+
+def benchmarkTopK(cache, dtype):
+    print("----------------------------------------------")
+    print("top-k predictions, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    wrapper = SVMWrapper(-1, dtype)
+    wrapper.processDataset(cache.bestParamsLarge, False)
+    wrapper.evaluateTopK(5)
+
+
+def benchmarkUpdate(cache, dtype):
+    print("----------------------------------------------")
+    print("incremental update vs. full retrain, all Categories, with params: ")
+    print(cache.bestParamsLarge)
+
+    wrapper = SVMWrapper(-1, dtype)
+    wrapper.compareUpdate(cache.bestParamsLarge)
+
+
+benchmarks = {
+    "ovr": benchmarkOvR,
+    "approx": benchmarkKernelApproximation,
+    "dedup": benchmarkDeduplication,
+    "prefetch": benchmarkPrefetch,
+    "golden": benchmarkGolden,
+    "compact": benchmarkCompact,
+    "topk": benchmarkTopK,
+    "update": benchmarkUpdate
+}
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+dtype = 'reuters'
+#dtype = 'twentyNews'
+
+#run the benchmarks given on the command line, all of them otherwise
+names = sys.argv[1:] if len(sys.argv) > 1 else list(benchmarks.keys())
+
+cache = Cache(dtype)
+for name in names:
+    benchmarks[name](cache, dtype)
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------
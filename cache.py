@@ -1,11 +1,11 @@
+import hashlib
 import json
 from collections import Counter
-from progress.counter import Counter as PCounter
-from progress.bar import ChargingBar
-from sklearn.model_selection import GridSearchCV
-from sklearn.svm import SVC
+from typing import Optional
 from data import SetFactory
 from preprocessing import PreprocessorFactory
+from report import RunReport
+from vocabulary import VocabularyBuilder
 
 import data
 import preprocessing
@@ -14,14 +14,27 @@ import preprocessing
 class Cache:
 
     _recreateCacheFile = False
+    #only reprocess corpus files that were added or changed since the last refresh
+    _refreshCacheFile = False
+    #build the vocabulary with bounded memory (sketch + exact pass over the survivors)
+    _streamingVocabulary = False
+    #grid search along C paths that share the kernel matrix instead of independent fits.
+    #faster, but every path holds a dense kernel matrix of the training set (n x n float64)
+    _regularizationPath = False
+
+    _partsFile = "cache.parts"
 
     def __init__(self, dtype='reuters'):
         self._articleCount = 0
         self._words = {}
         self._bestParams = {"C": 1000, "gamma": 0.001, "kernel": "rbf"}
+        self._bestParamsLarge = self._bestParams
+        self._bestParamsSmall = self._bestParams
         self._categories = []
         if self._recreateCacheFile:
             self.writeCache(dtype)
+        elif self._refreshCacheFile:
+            self.refreshCache(dtype)
 
         self.getCache()
 
@@ -61,31 +74,30 @@ class Cache:
         self._categories = Counter(data['categories'])
 
     def analyzeArticles(self, preprocessor: preprocessing.Preprocessor, dtype='reuters'):
-        #check data type
-        if dtype == 'reuters':
-            #initialize SoupLoader
-            soupLoader = data.SoupLoader(-1)
-            provider = data.ReutersProvider(soupLoader)
-        else:
-            provider = data.TwentyNewsProvider('../TwentyNews/')
+        #initialize provider for the data type
+        provider = data.ProviderFactory.FACTORY(dtype)
 
         #start Counters
-        bar = PCounter("Analyzing Articles: ")
+        report = RunReport.ACTIVE()
         counter = Counter()
         occurances = Counter()
         categories = Counter()
+        articleCount = 0
         while True:
             try:
-                #increase bar progress
-                bar.next()
-                
+                #count like the old progress counter, the last call finds no article
+                articleCount += 1
+                report.progress("Analyzing Articles")
+
                 #throws an exception if there are no more articles. saving is not needed
                 article = data.ArticleFactory.GET_NEXT_ARTICLE(provider)
+                report.record("preprocess", 1)
 
                 #update the counter with the preprocessed array of words
                 words = preprocessor.process(article).preprocessed
                 counter.update(words)
-                #update in how many articles these words occur
+                #update in how many articles these words occur. the preprocessor keeps every word it has
+                #seen, so this counts the articles since the first occurance of a word (see _occurances)
                 occurances.update(list(words.keys()))
                 #update categories counter
                 categories.update([article.category])
@@ -94,12 +106,52 @@ class Cache:
                 #abort while loop. No more Articles
                 break
         
-        bar.finish()
+        report.finishProgress("Analyzing Articles")
+        report.measure("preprocess")
 
-        self._articleCount = bar.index
+        self._articleCount = articleCount
         self._words = self.cropWords(counter, occurances)
         self._categories = categories
 
+    @staticmethod
+    def _occurances(first: dict, articleCount) -> Counter:
+        #the occurances of analyzeArticles, from the index of the article a word first occurs in
+        return Counter({word: articleCount - index for word, index in first.items()})
+
+    def _iterateWords(self, preprocessor: preprocessing.Preprocessor, dtype, message, categories=None):
+        #yield the word counts of every article, one at a time
+        provider = data.ProviderFactory.FACTORY(dtype)
+        report = RunReport.ACTIVE()
+        while True:
+            try:
+                report.progress(message)
+                article = data.ArticleFactory.GET_NEXT_ARTICLE(provider)
+                report.record("preprocess", 1)
+            except data.OutOfArticlesError:
+                break
+
+            if categories != None:
+                categories.update([article.category])
+            yield Counter(preprocessor.processWords(article.text))
+
+        report.finishProgress(message)
+
+    def analyzeArticlesStreaming(self, preprocessor: preprocessing.Preprocessor, dtype='reuters',
+                                 builder: Optional[VocabularyBuilder] = None):
+        if builder == None:
+            builder = VocabularyBuilder()
+
+        #first pass: approximate counts, only candidates are remembered
+        categories = Counter()
+        for words in self._iterateWords(preprocessor, dtype, "Sketching Articles", categories):
+            builder.add(words)
+
+        #second pass: exact counts of the candidates
+        #same totals as analyzeArticles, which counts one more article for the last call
+        self._articleCount = builder.articleCount + 1
+        self._words = builder.finalize(self._iterateWords(preprocessor, dtype, "Counting Candidates"))
+        self._categories = categories
+
     def cropWords(self, words: Counter, occurances: Counter) -> Counter:
         result = Counter()
         for word in words:
@@ -118,7 +170,7 @@ class Cache:
 
         return result
 
-    def recalcBestParams(self, limitCategories = -1):
+    def recalcBestParams(self, limitCategories = -1, nJobs = 1):
         #init Preprocessor
         preprocessor = PreprocessorFactory.FACTORY(list(
             self.words.keys()))
@@ -134,10 +186,7 @@ class Cache:
         dataSet = SetFactory.PREPARE_DATASET(int(self.articleCount / 2), preprocessor,
                 self.articleCount, categories)
 
-        #init GridSearch for best parameters
-        gsc = GridSearchCV(
-        estimator=SVC(kernel='rbf'),
-        param_grid=[{
+        paramGrid = [{
             'C': [1, 100, 1000],
             'gamma': [0.001, 0.005, 0.1, 1, 3, 5],
             'kernel': ['linear']
@@ -152,20 +201,41 @@ class Cache:
             'degree': [1, 2, 3, 4, 5],
             'gamma': [0.001, 0.005, 0.1, 1, 3, 5],
             'kernel': ['poly']
-        }],
-        cv=5, scoring=None, verbose=5, n_jobs=1)
+        }]
+
+        #share the training set with the workers through a memory map
+        if nJobs != 1:
+            dataSet[0].spill()
 
         #do it!!
-        gridResult = gsc.fit(dataSet[0].getTextArray(), dataSet[0].getCategories())
+        try:
+            if self._regularizationPath:
+                from engines import RegularizationPath
+                return RegularizationPath.GRID_SEARCH(dataSet[0].getTextArray(), dataSet[0].getCategories(),
+                                                      paramGrid, 5, nJobs, dataSet[0].getSpillDirectory())
+
+            #init GridSearch for best parameters
+            from sklearn.model_selection import GridSearchCV
+            from sklearn.svm import SVC
+            gsc = GridSearchCV(estimator=SVC(kernel='rbf'), param_grid=paramGrid,
+                               cv=5, scoring=None, verbose=5, n_jobs=nJobs)
+            gridResult = gsc.fit(dataSet[0].getTextArray(), dataSet[0].getCategories())
+        finally:
+            dataSet[0].release()
 
         return gridResult.best_params_
 
     def writeCache(self, dtype='reuters'):
+        if self._streamingVocabulary:
+            self.analyzeArticlesStreaming(preprocessing.PreprocessorFactory.CACHE_FACTORY(), dtype)
+        else:
+            self.analyzeArticles(preprocessing.PreprocessorFactory.CACHE_FACTORY(), dtype)
+
+        self._saveCache()
+
+    def _saveCache(self):
         #save the cache file
         cache = {}
-        
-        self.analyzeArticles(preprocessing.PreprocessorFactory.CACHE_FACTORY(), dtype)
-
         cache['articleCount'] = self.articleCount
         cache['bestParamsLarge'] = self.bestParamsLarge
         cache['bestParamsSmall'] = self.bestParamsSmall
@@ -175,3 +245,130 @@ class Cache:
         file = open("cache", "w+")
         file.write(json.dumps(cache))
         file.close()
+
+    def _getSources(self, dtype) -> dict:
+        #every part of the corpus that can be refreshed on its own, with its files
+        if dtype == 'reuters':
+            return {path.name: [path] for path in data.SoupLoader(-1).getFiles() if path.exists()}
+
+        #an archive is read in one pass, splitting it by category would read it once per category
+        archive = data.TwentyNewsArchive.FIND('../TwentyNews/')
+        if archive != None:
+            return {archive.path.name: [archive.path]}
+
+        return {directory.name: [x for x in directory.iterdir()]
+                for directory in data.TwentyNewsProvider.GET_DIRECTORIES('../TwentyNews/')}
+
+    def _getProvider(self, dtype, name, files) -> data.AbstractProvider:
+        if dtype == 'reuters':
+            return data.ReutersProvider(data.SoupLoader(-1, files))
+
+        #the archive is a single part with all categories
+        if data.TwentyNewsArchive.FIND('../TwentyNews/') != None:
+            return data.TwentyNewsProvider('../TwentyNews/')
+        return data.TwentyNewsProvider('../TwentyNews/', [name])
+
+    @staticmethod
+    def _fingerprint(files) -> str:
+        #hash over names and contents of all files of a part
+        digest = hashlib.sha1()
+        for path in sorted(files):
+            digest.update(path.name.encode('utf-8'))
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def _analyzePart(self, preprocessor: preprocessing.Preprocessor, provider: data.AbstractProvider) -> dict:
+        #partial statistics of one part of the corpus. first is the index of the article a word first occurs in
+        part = {"articleCount": 0, "terms": Counter(), "first": {}, "categories": Counter()}
+        while True:
+            try:
+                article = data.ArticleFactory.GET_NEXT_ARTICLE(provider)
+            except data.OutOfArticlesError:
+                break
+
+            words = Counter(preprocessor.processWords(article.text))
+            part["terms"].update(words)
+            for word in words:
+                if word not in part["first"]:
+                    part["first"][word] = part["articleCount"]
+            part["categories"].update([article.category])
+            part["articleCount"] += 1
+
+        return part
+
+    def _loadParts(self, dtype) -> dict:
+        try:
+            with open(self._partsFile, "r") as file:
+                parts = json.load(file)
+        except FileNotFoundError:
+            return {}
+
+        #partial statistics of another corpus are useless
+        if parts["dtype"] != dtype:
+            return {}
+        return parts["parts"]
+
+    def refreshCache(self, dtype='reuters'):
+        #keep the best params of the current cache file
+        try:
+            with open("cache", "r") as file:
+                current = json.load(file)
+            self._bestParamsLarge = current['bestParamsLarge']
+            self._bestParamsSmall = current['bestParamsSmall']
+        except FileNotFoundError:
+            current = None
+
+        parts = self._loadParts(dtype)
+        sources = self._getSources(dtype)
+        preprocessor = preprocessing.PreprocessorFactory.CACHE_FACTORY()
+
+        #reprocess new and changed parts only
+        refreshed = []
+        report = RunReport.ACTIVE()
+        for name, files in sources.items():
+            fingerprint = self._fingerprint(files)
+            #parts of older refreshes have no first occurances
+            if name not in parts or parts[name]["fingerprint"] != fingerprint or "first" not in parts[name]:
+                parts[name] = self._analyzePart(preprocessor, self._getProvider(dtype, name, files))
+                parts[name]["fingerprint"] = fingerprint
+                refreshed.append(name)
+            report.progress("Refreshing Cache", len(sources))
+        report.finishProgress("Refreshing Cache", len(sources))
+
+        #parts that do not exist anymore
+        removed = [name for name in parts if name not in sources]
+        for name in removed:
+            del parts[name]
+
+        print("Refreshed: " + str(refreshed))
+        print("Removed: " + str(removed))
+        if len(refreshed) == 0 and len(removed) == 0 and current != None:
+            #cache is up to date
+            return
+
+        #merge the partial statistics in the order the full rebuild reads the parts
+        terms = Counter()
+        first = {}
+        categories = Counter()
+        articleCount = 0
+        for name in sources:
+            part = parts[name]
+            terms.update(part["terms"])
+            for word, index in part["first"].items():
+                if word not in first:
+                    first[word] = articleCount + index
+            categories.update(part["categories"])
+            articleCount += part["articleCount"]
+
+        #same totals as analyzeArticles, which counts one more article for the last call
+        self._articleCount = articleCount + 1
+        self._words = self.cropWords(terms, self._occurances(first, articleCount))
+        self._categories = categories
+
+        file = open(self._partsFile, "w+")
+        file.write(json.dumps({"dtype": dtype, "parts": parts}))
+        file.close()
+
+        self._saveCache()
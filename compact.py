@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import tempfile
+
+from lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+class CompactModel:
+    #sparse, optionally quantized copy of a fitted SVC. the decision function is evaluated
+    #directly from the stored support vectors, sklearn is not needed to serve it
+
+    def __init__(self, supportVectors, dualCoef, intercept, classes, nSupport, params: dict):
+        self._supportVectors = supportVectors
+        self._dualCoef = dualCoef
+        self._intercept = intercept
+        self.classes_ = classes
+        self._nSupport = nSupport
+        self._params = params
+
+        #squared norms of the support vectors, needed by the rbf kernel
+        self._norms = np.asarray(supportVectors.multiply(supportVectors).sum(axis=1), dtype=np.float64).ravel()
+        #first support vector of every class
+        self._starts = np.concatenate([[0], np.cumsum(nSupport)])
+
+    @property
+    def params(self) -> dict:
+        return self._params
+
+    @staticmethod
+    def EXPORT(svc, dtype = 'float32') -> CompactModel:
+        from scipy import sparse
+
+        params = {"kernel": svc.kernel, "gamma": float(svc._gamma), "coef0": float(svc.coef0),
+                  "degree": int(svc.degree), "C": float(svc.C), "dtype": dtype}
+        #scipy has no float16 matrices, quantized values are kept in the smallest supported type
+        quantized = np.asarray(svc.support_vectors_, dtype=dtype)
+        supportVectors = sparse.csr_matrix(quantized.astype(np.promote_types(dtype, np.float32)))
+        return CompactModel(supportVectors, np.asarray(svc.dual_coef_), np.asarray(svc.intercept_),
+                            np.asarray(svc.classes_), np.asarray(svc.n_support_), params)
+
+    def save(self, path) -> None:
+        vectors = self._supportVectors
+        np.savez_compressed(path, data=vectors.data.astype(self._params["dtype"]), indices=vectors.indices, indptr=vectors.indptr,
+                            shape=np.array(vectors.shape), dualCoef=self._dualCoef, intercept=self._intercept,
+                            classes=self.classes_, nSupport=self._nSupport, params=json.dumps(self._params))
+
+    @staticmethod
+    def LOAD(path) -> CompactModel:
+        from scipy import sparse
+
+        with np.load(path) as stored:
+            data = stored["data"].astype(np.promote_types(stored["data"].dtype, np.float32))
+            supportVectors = sparse.csr_matrix((data, stored["indices"], stored["indptr"]),
+                                               shape=tuple(stored["shape"]))
+            return CompactModel(supportVectors, stored["dualCoef"], stored["intercept"], stored["classes"],
+                                stored["nSupport"], json.loads(str(stored["params"])))
+
+    def getSupportVectors(self):
+        #dense support vectors and their categories, e.g. to retrain with new articles
+        categories = np.repeat(self.classes_, self._nSupport)
+        return self._supportVectors.toarray().astype(np.float64), categories
+
+    def _kernel(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        dot = np.asarray((self._supportVectors @ features.T).T, dtype=np.float64)
+        kernel = self._params["kernel"]
+        gamma = self._params["gamma"]
+
+        if kernel == 'linear':
+            return dot
+        if kernel == 'rbf':
+            distances = (features * features).sum(axis=1)[:, None] + self._norms[None, :] - 2 * dot
+            return np.exp(-gamma * np.maximum(distances, 0))
+        if kernel == 'poly':
+            return (gamma * dot + self._params["coef0"]) ** self._params["degree"]
+        if kernel == 'sigmoid':
+            return np.tanh(gamma * dot + self._params["coef0"])
+
+        raise ValueError("Kernel " + str(kernel) + " is not supported.")
+
+    def _pairwise(self, features):
+        #one column per pair of classes, in libsvm order. positive values vote for the first class
+        kernel = self._kernel(features)
+        starts = self._starts
+        columns = []
+        pair = 0
+        for first in range(len(self.classes_)):
+            for second in range(first + 1, len(self.classes_)):
+                firstVectors = slice(starts[first], starts[first + 1])
+                secondVectors = slice(starts[second], starts[second + 1])
+                columns.append(kernel[:, firstVectors] @ self._dualCoef[second - 1, firstVectors]
+                               + kernel[:, secondVectors] @ self._dualCoef[first, secondVectors]
+                               + self._intercept[pair])
+                pair += 1
+        return np.column_stack(columns)
+
+    def decision_function(self, features):
+        pairwise = self._pairwise(features)
+
+        #binary svms are stored with flipped signs, positive values mean the second class
+        if len(self.classes_) == 2:
+            return pairwise.ravel()
+
+        #one-vs-rest shape like SVC(decision_function_shape="ovr"): votes plus scaled confidences
+        classes = len(self.classes_)
+        votes = np.zeros((pairwise.shape[0], classes))
+        confidences = np.zeros((pairwise.shape[0], classes))
+        pair = 0
+        for first in range(classes):
+            for second in range(first + 1, classes):
+                votes[pairwise[:, pair] >= 0, first] += 1
+                votes[pairwise[:, pair] < 0, second] += 1
+                confidences[:, first] += pairwise[:, pair]
+                confidences[:, second] -= pairwise[:, pair]
+                pair += 1
+        return votes + confidences / (3 * (np.abs(confidences) + 1))
+
+    def predict(self, features):
+        pairwise = self._pairwise(features)
+        if len(self.classes_) == 2:
+            return self.classes_[(pairwise.ravel() > 0).astype(int)]
+
+        #one-vs-one voting like libsvm, ties go to the first class
+        classes = len(self.classes_)
+        votes = np.zeros((pairwise.shape[0], classes), dtype=np.int64)
+        pair = 0
+        for first in range(classes):
+            for second in range(first + 1, classes):
+                votes[pairwise[:, pair] > 0, first] += 1
+                votes[pairwise[:, pair] <= 0, second] += 1
+                pair += 1
+        return self.classes_[np.argmax(votes, axis=1)]
+
+    @staticmethod
+    def COMPARE(svc, features, categories, dtypes = ['float64', 'float32', 'float16']) -> list:
+        #size and accuracy of the compact formats against the original svc
+        from sklearn.metrics import accuracy_score
+
+        original = svc.predict(features)
+        results = [("SVC (pickle)", len(pickle.dumps(svc)), accuracy_score(categories, original), 1.0)]
+
+        directory = tempfile.mkdtemp(prefix="compact_")
+        for dtype in dtypes:
+            path = os.path.join(directory, "model-" + dtype + ".npz")
+            CompactModel.EXPORT(svc, dtype).save(path)
+            predicted = CompactModel.LOAD(path).predict(features)
+            results.append(("compact " + dtype, os.path.getsize(path), accuracy_score(categories, predicted),
+                            float(np.mean(predicted == original))))
+            os.remove(path)
+        os.rmdir(directory)
+
+        print("----------------------------------------------")
+        print("model | size | accuracy | agreement with SVC")
+        for name, size, accuracy, agreement in results:
+            print(name + " | " + str(round(size / 1024, 1)) + " KiB | " + str(round(accuracy, 4))
+                  + " | " + str(round(agreement, 4)))
+        return results
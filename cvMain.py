@@ -0,0 +1,33 @@
+import time
+from experiment import ExperimentRunner
+from cache import Cache
+from report import RunReport
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+report = RunReport.START("cvMain")
+
+dtype = 'reuters'
+#dtype = 'twentyNews'
+
+cache = Cache(dtype)
+
+#preprocess once, every fold is a row selection on the same feature store
+runner = ExperimentRunner(dtype)
+runner.crossValidate("SVM, all Categories", -1, cache.bestParamsLarge, folds=5)
+runner.crossValidate("SVM, Categories >= 200 Articles", 7, cache.bestParamsSmall, folds=5)
+
+report.print()
+report.write("report.json")
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------
@@ -1,10 +1,28 @@
-from pathlib import Path
-from typing import List, Optional, Counter
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import mmap
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+import weakref
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Iterator, List, Optional, Counter, Tuple
 
-import numpy as np
-from progress.bar import ChargingBar
-from bs4 import BeautifulSoup
 import data
+from lazy import LazyModule
+from report import RunReport
+
+#heavy dependencies are only loaded on the code paths that need them
+np = LazyModule("numpy")
 
 
 class OutOfArticlesError(Exception):
@@ -77,12 +95,61 @@ class Article:
         self.preprocessed = preprocessor.process(self).preprocessed
 
 
+class CorpusFile:
+    #plain, gzip and xz compressed corpus files are opened the same way.
+    #compressed files are decompressed while reading, nothing is unpacked on disk
+
+    _compressions = ['', '.gz', '.xz']
+
+    @staticmethod
+    def FIND(path: Path) -> Path:
+        #the plain file, or its compressed version if only that one exists
+        for suffix in CorpusFile._compressions:
+            candidate = path.with_name(path.name + suffix)
+            if candidate.exists():
+                return candidate
+        return path
+
+    @staticmethod
+    def PLAIN(path: Path) -> Path:
+        #name of the file before compression
+        if path.suffix in CorpusFile._compressions[1:]:
+            return path.with_suffix('')
+        return path
+
+    @staticmethod
+    def OPEN(path: Path, binary = False):
+        mode = 'rb' if binary else 'rt'
+        if path.suffix == '.gz':
+            return gzip.open(path, mode)
+        if path.suffix == '.xz':
+            return lzma.open(path, mode)
+        return open(path, 'rb' if binary else 'r')
+
+    @staticmethod
+    def MAP(path: Path):
+        #plain files are memory mapped, compressed ones can not be and are decompressed into memory once
+        if path.suffix in CorpusFile._compressions[1:]:
+            with CorpusFile.OPEN(path, True) as f:
+                return f.read()
+
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def CLOSE(mapped) -> None:
+        if isinstance(mapped, mmap.mmap):
+            mapped.close()
+
+
 class SoupLoader:
 
     _max = 22
 
-    def __init__(self, stopAtFileNumber):
+    def __init__(self, stopAtFileNumber, files: Optional[List[Path]] = None):
         self._stopAt = stopAtFileNumber
+        #explicit list of files to read instead of the whole corpus
+        self._files = files
         self._currentSoup = None
         self._startedSearch = False
         self._counter = 0
@@ -96,7 +163,8 @@ class SoupLoader:
     def _getNextFile(self, increment=True) -> Optional[Path]:
         #as the files are numbered:
         #if counter is max, return None
-        if (self._counter == self._max):
+        files = self.getFiles()
+        if (self._counter == len(files)):
             return None
 
         #stop somewhere in the middle?
@@ -105,13 +173,27 @@ class SoupLoader:
             self._stopAt = -1
             return None
 
-        #create the filename with leading zero
-        filename = 'reut2-{}.sgm'.format(f"{self._counter:03d}")
+        path = files[self._counter]
 
         if (increment):
             self._counter += 1
 
-        return self._getPath() / filename
+        return path
+
+    @staticmethod
+    def FILENAME(number: int) -> str:
+        return 'reut2-{}.sgm'.format(f"{number:03d}")
+
+    def getFiles(self) -> List[Path]:
+        #all corpus files, regardless of the current position
+        if self._files != None:
+            return list(self._files)
+        return SoupLoader.FILES(self._getPath())
+
+    @staticmethod
+    def FILES(path: Path) -> List[Path]:
+        #all corpus files in a directory, plain or compressed
+        return [CorpusFile.FIND(path / SoupLoader.FILENAME(number)) for number in range(SoupLoader._max)]
 
     def _getNextSoup(self) -> Optional[BeautifulSoup]:
         #get file Directory
@@ -119,9 +201,13 @@ class SoupLoader:
         if (fileDir == None):
             return None
 
+        from bs4 import BeautifulSoup
+
         #open file
-        f = open(fileDir, 'r')
+        f = CorpusFile.OPEN(fileDir)
         data = f.read()
+        f.close()
+        RunReport.ACTIVE().record("ingest", bytes=os.path.getsize(fileDir))
 
         return BeautifulSoup(data, "html.parser")
 
@@ -158,6 +244,210 @@ class SoupLoader:
         return tag
 
 
+class ReutersIndex:
+    #byte offsets of all <REUTERS> records, so single articles can be read without parsing whole files.
+    #offsets are into the decompressed content and files are stored by their plain name, so the
+    #index stays valid when files are compressed later
+
+    _fileName = 'reuters.index.json'
+
+    _idRegex = re.compile(rb'NEWID="(\d+)"')
+    _topicsRegex = re.compile(rb'<TOPICS>(.*?)</TOPICS>', re.DOTALL)
+    _placesRegex = re.compile(rb'<PLACES>(.*?)</PLACES>', re.DOTALL)
+    _dRegex = re.compile(rb'<D>(.*?)</D>', re.DOTALL)
+
+    def __init__(self, entries: List[dict], files: Optional[dict] = None):
+        self._entries = entries
+        #size, mtime and content hash of every indexed file
+        self._files = files if files != None else {}
+        self._byId = {entry['id']: entry for entry in entries}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> List[dict]:
+        return self._entries
+
+    @staticmethod
+    def _getTopic(record: bytes) -> Optional[str]:
+        #same rules as ReutersProvider.getCategory: first <D> of topics, places if there are no topics
+        topics = ReutersIndex._topicsRegex.search(record)
+        if topics == None:
+            topics = ReutersIndex._placesRegex.search(record)
+        if topics != None:
+            ds = ReutersIndex._dRegex.search(topics.group(1))
+            if ds != None:
+                return ds.group(1).decode('utf-8', 'replace').strip()
+        return None
+
+    @staticmethod
+    def BUILD(soupLoader: Optional[SoupLoader] = None) -> 'ReutersIndex':
+        if soupLoader == None:
+            soupLoader = SoupLoader(-1)
+
+        entries = []
+        files = {}
+        for path in soupLoader.getFiles():
+            if not path.exists():
+                continue
+
+            mapped = CorpusFile.MAP(path)
+            try:
+                files[CorpusFile.PLAIN(path).name] = dict(ReutersIndex._stat(path), hash=hashlib.sha1(mapped).hexdigest())
+                start = mapped.find(b'<REUTERS')
+                while start != -1:
+                    end = mapped.find(b'</REUTERS>', start)
+                    if end == -1:
+                        break
+                    end += len(b'</REUTERS>')
+
+                    record = mapped[start:end]
+                    articleId = ReutersIndex._idRegex.search(record)
+                    entries.append({
+                        'file': CorpusFile.PLAIN(path).name,
+                        'offset': start,
+                        'length': end - start,
+                        'id': int(articleId.group(1)) if articleId != None else -1,
+                        'topic': ReutersIndex._getTopic(record)
+                    })
+
+                    start = mapped.find(b'<REUTERS', end)
+            finally:
+                CorpusFile.CLOSE(mapped)
+
+        return ReutersIndex(entries, files)
+
+    @staticmethod
+    def _stat(path: Path) -> dict:
+        stat = path.stat()
+        return {'file': path.name, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def save(self, path: Path = Path('../Reuters/')) -> None:
+        with open(path / self._fileName, 'w') as file:
+            json.dump({'files': self._files, 'entries': self._entries}, file)
+
+    @staticmethod
+    def LOAD(path: Path = Path('../Reuters/')) -> 'ReutersIndex':
+        with open(path / ReutersIndex._fileName, 'r') as file:
+            index = json.load(file)
+
+        #indices of older versions only have the entries and are never valid
+        if isinstance(index, list):
+            return ReutersIndex(index)
+        return ReutersIndex(index['entries'], index['files'])
+
+    def validate(self, soupLoader: Optional[SoupLoader] = None) -> Tuple[bool, bool]:
+        #whether the indexed files are unchanged, and whether their stats had to be updated
+        if soupLoader == None:
+            soupLoader = SoupLoader(-1)
+
+        paths = {CorpusFile.PLAIN(path).name: path for path in soupLoader.getFiles() if path.exists()}
+        if len(self._files) == 0 or paths.keys() != self._files.keys():
+            return False, False
+
+        updated = False
+        for name, path in paths.items():
+            stored = self._files[name]
+            stat = ReutersIndex._stat(path)
+            if all(stored[key] == stat[key] for key in stat):
+                continue
+
+            #compressed or touched since the index was built, the content decides
+            mapped = CorpusFile.MAP(path)
+            try:
+                digest = hashlib.sha1(mapped).hexdigest()
+            finally:
+                CorpusFile.CLOSE(mapped)
+            if digest != stored['hash']:
+                return False, False
+
+            stored.update(stat)
+            updated = True
+
+        return True, updated
+
+    @staticmethod
+    def LOAD_OR_BUILD(path: Path = Path('../Reuters/')) -> 'ReutersIndex':
+        #the index is only built once and saved beside the corpus, it is rebuilt when a file changed
+        soupLoader = SoupLoader(-1, SoupLoader.FILES(path))
+        try:
+            index = ReutersIndex.LOAD(path)
+            valid, updated = index.validate(soupLoader)
+        except FileNotFoundError:
+            valid, updated = False, False
+
+        if not valid:
+            print("building Reuters index")
+            index = ReutersIndex.BUILD(soupLoader)
+            index.save(path)
+        elif updated:
+            index.save(path)
+        return index
+
+    def get(self, articleId: int) -> Optional[dict]:
+        return self._byId.get(articleId)
+
+    def byCategory(self, categories: List[str]) -> List[dict]:
+        return [entry for entry in self._entries if entry['topic'] in categories]
+
+    def shard(self, worker: int, workers: int, entries: Optional[List[dict]] = None) -> List[dict]:
+        #contiguous, evenly sized part of the entries for one worker
+        if entries == None:
+            entries = self._entries
+        size, rest = divmod(len(entries), workers)
+        start = worker * size + min(worker, rest)
+        end = start + size + (1 if worker < rest else 0)
+        return entries[start:end]
+
+
+class IndexedSoupLoader:
+    #drop-in replacement for SoupLoader, reading only the indexed records
+
+    def __init__(self, entries: List[dict], path: Path = Path('../Reuters/')):
+        self._entries = entries
+        self._path = path
+        self._position = 0
+        self._files = {}
+
+    def _getMapped(self, fileName: str) -> mmap.mmap:
+        #keep the files mapped, the os pages in what is needed
+        if fileName not in self._files:
+            #the file may have been compressed since it was indexed
+            self._files[fileName] = CorpusFile.MAP(CorpusFile.FIND(self._path / fileName))
+        return self._files[fileName]
+
+    def readRecord(self, entry: dict) -> BeautifulSoup:
+        from bs4 import BeautifulSoup
+
+        mapped = self._getMapped(entry['file'])
+        record = mapped[entry['offset']:entry['offset'] + entry['length']]
+        RunReport.ACTIVE().record("ingest", bytes=entry['length'])
+        return BeautifulSoup(record.decode('utf-8', 'replace'), "html.parser").find("reuters")
+
+    def getNextReutersTag(self) -> Optional[BeautifulSoup]:
+        if self._position >= len(self._entries):
+            #no further records, release the mapped files
+            for mapped in self._files.values():
+                CorpusFile.CLOSE(mapped)
+            self._files = {}
+            return None
+
+        entry = self._entries[self._position]
+        self._position += 1
+        return self.readRecord(entry)
+
+
+class TagListLoader:
+    #soup loader over <REUTERS> tags that were already parsed
+
+    def __init__(self, tags: List[BeautifulSoup]):
+        self._tags = iter(tags)
+
+    def getNextReutersTag(self) -> Optional[BeautifulSoup]:
+        return next(self._tags, None)
+
+
 class AbstractProvider:
     
     def getCategory(self) -> str:
@@ -216,38 +506,65 @@ class ReutersProvider(AbstractProvider):
     
 class TwentyNewsProvider(AbstractProvider):
 
-    def __init__(self, filePath):
+    def __init__(self, filePath, directories: Optional[List[str]] = None):
         self.dataSet = []
         self._current = -1
         self._max = 0
-        self.load(filePath)
+        self.load(filePath, directories)
         
-    def load(self, filePath):
-        entries = Path(filePath)
+    def load(self, filePath, directories: Optional[List[str]] = None):
+        #the tree packed into one archive instead of many small files
+        archive = TwentyNewsArchive.FIND(filePath)
+        if archive != None:
+            dataSet = []
+            for lines, category, name in archive.read(directories):
+                article = TwentyNewsProvider.PARSE(lines, category, name)
+                if article != None:
+                    dataSet.append(article)
+            self._max = len(dataSet)
+            self.dataSet = dataSet
+            return
+
         dataSet = []
-        path = [x for x in entries.iterdir() if x.is_dir()]
-        for directory in path:
+        for directory in TwentyNewsProvider.GET_DIRECTORIES(filePath):
+            #only load the given category directories
+            if directories != None and directory.name not in directories:
+                continue
             direct = [x for x in directory.iterdir()]
             print(directory.name)
             for afile in direct:
                 f = afile.open()
-                text = f.readlines()
-                del text[0:2]
-                newText = " ".join(text)
-                newText = newText.strip()
-                notAllowed = [None, ""]
-                if newText not in notAllowed:
-                    try:
-                        article = Article(newText, directory.name)
-                        dataSet.append(article)
-                    except ValueError as error:
-                        import sys
-                        #extend stacktrace and message of cought exception
-                        raise type(error)("The file: " + str(afile) + "had an error:\n" + "Could not create Article. Reason: " + str(error)).with_traceback(sys.exc_info()[2])
-                
+                article = TwentyNewsProvider.PARSE(f.readlines(), directory.name, afile)
+                f.close()
+                RunReport.ACTIVE().record("ingest", bytes=afile.stat().st_size)
+                if article != None:
+                    dataSet.append(article)
+
         self._max = len(dataSet)
         self.dataSet = dataSet
-                
+
+    @staticmethod
+    def GET_DIRECTORIES(filePath) -> List[Path]:
+        entries = Path(filePath)
+        return [x for x in entries.iterdir() if x.is_dir()]
+
+    @staticmethod
+    def PARSE(text: List[str], category: str, afile) -> Optional[Article]:
+        #skip the header lines
+        del text[0:2]
+        newText = " ".join(text)
+        newText = newText.strip()
+        notAllowed = [None, ""]
+        if newText in notAllowed:
+            return None
+
+        try:
+            return Article(newText, category)
+        except ValueError as error:
+            import sys
+            #extend stacktrace and message of cought exception
+            raise type(error)("The file: " + str(afile) + "had an error:\n" + "Could not create Article. Reason: " + str(error)).with_traceback(sys.exc_info()[2])
+
     def getCategory(self):
         return self.dataSet[self._current].category
         
@@ -264,6 +581,77 @@ class TwentyNewsProvider(AbstractProvider):
             return False
 
 
+class TwentyNewsArchive:
+    #the TwentyNews tree in one tar (plain, gz, bz2 or xz) or zip archive. the category is the
+    #directory of a member. tar archives are read as a stream, members are decompressed one by one
+
+    _suffixes = ['.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.zip']
+
+    def __init__(self, path: Path):
+        self._path = Path(path)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @staticmethod
+    def FIND(filePath) -> Optional['TwentyNewsArchive']:
+        #an unpacked tree is preferred, otherwise look for an archive beside it
+        path = Path(filePath)
+        if path.is_dir():
+            return None
+        if path.is_file():
+            return TwentyNewsArchive(path)
+
+        for suffix in TwentyNewsArchive._suffixes:
+            candidate = path.with_name(path.name + suffix)
+            if candidate.is_file():
+                return TwentyNewsArchive(candidate)
+        return None
+
+    @staticmethod
+    def _category(name: str) -> str:
+        return PurePosixPath(name).parent.name
+
+    def _members(self) -> Iterator[Tuple[str, io.BufferedIOBase]]:
+        #name and content of every file, in archive order
+        if self._path.suffix == '.zip':
+            with zipfile.ZipFile(self._path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        with archive.open(info) as member:
+                            yield info.filename, member
+            return
+
+        with tarfile.open(self._path, 'r|*') as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, archive.extractfile(info)
+
+    def categories(self) -> List[str]:
+        categories = {}
+        for name, _ in self._members():
+            if TwentyNewsArchive._category(name) != "":
+                categories[TwentyNewsArchive._category(name)] = None
+        return list(categories.keys())
+
+    def read(self, directories: Optional[List[str]] = None) -> Iterator[Tuple[List[str], str, str]]:
+        #lines, category and name of every article, like reading the unpacked files
+        current = None
+        for name, member in self._members():
+            category = TwentyNewsArchive._category(name)
+            if category == "" or (directories != None and category not in directories):
+                continue
+            if category != current:
+                print(category)
+                current = category
+
+            #decoded like a file opened in text mode, members are small enough to be read at once
+            yield io.TextIOWrapper(io.BytesIO(member.read())).readlines(), category, name
+
+        RunReport.ACTIVE().record("ingest", bytes=self._path.stat().st_size)
+
+
 class ArticleFactory:
 
     @staticmethod
@@ -294,8 +682,9 @@ class ArticleFactory:
         while provider.isValidElement():
             try:
                 article = ArticleFactory.FACTORY(provider, allowedCategories)
-            except ValueError:
+            except ValueError as error:
                 #Article is probably faulty, so just skip it
+                RunReport.ACTIVE().skip("ingest", str(error).split("Reason: ")[-1])
                 provider.next()
             else:
                 #creation worked, return the article
@@ -328,10 +717,89 @@ class DataSet:
             self._preprocessed.append(article.preprocessed)
             self._categories.append(article.category)
 
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def getSpillDirectory(self) -> Optional[str]:
+        return self._spillDirectory
+
+    def spill(self, directory = None) -> str:
+        #write feature matrix and labels into .npy files and replace the in-memory
+        #arrays with memory maps. worker pools attach to the files instead of pickling copies
+        if self._spillDirectory != None:
+            return self._spillDirectory
+
+        if directory == None:
+            directory = tempfile.mkdtemp(prefix="dataset_")
+
+        np.save(os.path.join(directory, "features.npy"), np.asarray(self._textArray, dtype=np.float64))
+        np.save(os.path.join(directory, "labels.npy"), np.asarray(self._categories))
+
+        #remove the files as soon as the dataset is gone
+        self._spillDirectory = directory
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+
+        self._textArray, self._categories = DataSet.ATTACH(directory)
+        return directory
+
+    def release(self) -> None:
+        #drop the spilled files and keep working on in-memory copies
+        if self._spillDirectory != None:
+            self._textArray = np.array(self._textArray)
+            self._categories = np.array(self._categories)
+            self._finalizer()
+            self._spillDirectory = None
+
+    def select(self, indices) -> 'DataSet':
+        #cheap row selection, e.g. to derive a category limited set from a shared store
+        subset = DataSet()
+        if isinstance(self._textArray, np.ndarray):
+            subset._textArray = self._textArray[indices]
+            subset._categories = self._categories[indices]
+        else:
+            subset._textArray = [self._textArray[index] for index in indices]
+            subset._categories = [self._categories[index] for index in indices]
+
+        if len(self._preprocessed) > 0:
+            subset._preprocessed = [self._preprocessed[index] for index in indices]
+        return subset
+
+    @staticmethod
+    def ATTACH(directory):
+        #attach to a spilled dataset without copying it
+        features = np.load(os.path.join(directory, "features.npy"), mmap_mode='r')
+        labels = np.load(os.path.join(directory, "labels.npy"), mmap_mode='r')
+        return features, labels
+
     def __init__(self):
         self._textArray = []
         self._preprocessed = []
         self._categories = []
+        self._spillDirectory = None
+
+
+class ProviderFactory:
+
+    @staticmethod
+    def FACTORY(dtype='reuters', prefetch=False) -> AbstractProvider:
+        #read and parse the files in background threads
+        if prefetch:
+            from pipeline import PipelineProvider, PrefetchPipeline
+            return PipelineProvider(PrefetchPipeline(dtype))
+
+        #check datatype and initialize provider
+        if dtype == 'reuters':
+            soupLoader = SoupLoader(-1)
+            return ReutersProvider(soupLoader)
+
+        return TwentyNewsProvider('../TwentyNews/')
+
+    @staticmethod
+    def SHARD(worker: int, workers: int, allowedCategories = []) -> AbstractProvider:
+        #reuters provider over an even part of the indexed corpus
+        index = ReutersIndex.LOAD_OR_BUILD()
+        entries = index.byCategory(allowedCategories) if len(allowedCategories) > 0 else index.entries
+        return ReutersProvider(IndexedSoupLoader(index.shard(worker, workers, entries)))
 
 
 class SetFactory:
@@ -339,32 +807,162 @@ class SetFactory:
 
     @staticmethod
     def PREPARE_DATASET(trainingArticleCount, preprocessor: Preprocessor,
-                        maxArticles, allowedCategories = [], dtype='reuters') -> List[DataSet]:
+                        maxArticles, allowedCategories = [], dtype='reuters', prefetch=False,
+                        deduplicator = None) -> List[DataSet]:
         #create Array with two datasets. One training, one test
         dataSet = [DataSet(), DataSet()]
         #check datatype and initialize provider
-        if dtype == 'reuters':
-            soupLoader = SoupLoader(-1)
-            provider = ReutersProvider(soupLoader)
+        if prefetch:
+            #reading, parsing and preprocessing run in background threads
+            from pipeline import PipelineProvider, PrefetchPipeline
+            provider = PipelineProvider(PrefetchPipeline(dtype, preprocessor, allowedCategories))
         else:
-            provider = TwentyNewsProvider('../TwentyNews/')
-
-        #start nice percentage bar. Good to have visuals ;)
-        bar = ChargingBar("Preparing dataset: ", max=maxArticles)
-        while bar.index <= maxArticles:
+            provider = ProviderFactory.FACTORY(dtype)
+
+        #reading and preprocessing alternate, so both phases are timed per article
+        report = RunReport.ACTIVE()
+        report.getPhase("ingest")
+        report.getPhase("preprocess")
+        index = 0
+        while index <= maxArticles:
             try:
                 #try to create a new article
-                article = ArticleFactory.GET_NEXT_ARTICLE(provider, allowedCategories)
-                article.process(preprocessor)
+                start = time.perf_counter()
+                if prefetch:
+                    article = provider.getNextArticle()
+                else:
+                    article = ArticleFactory.GET_NEXT_ARTICLE(provider, allowedCategories)
+                ingested = time.perf_counter()
+                report.record("ingest", 1, seconds=ingested - start)
+
+                #duplicates still count for the split, so the test set is the same with or without deduplication
+                part = min(int(index / trainingArticleCount), 1)
+                index += 1
+                report.progress("Preparing dataset", maxArticles)
+
+                #near duplicates add fit time, but no information. only the training set is deduplicated
+                if part == 0 and deduplicator != None and deduplicator.isDuplicate(article.text):
+                    report.skip("ingest", "near duplicate")
+                    continue
+
+                #the pipeline preprocesses on its own
+                if not prefetch:
+                    article.process(preprocessor)
+                    report.record("preprocess", 1, seconds=time.perf_counter() - ingested)
 
                 #append the article to the dataset
-                dataSet[int(bar.index / trainingArticleCount)].append(article)
-                
-                bar.next()
+                dataSet[part].append(article)
             except OutOfArticlesError:
-                #bar would stop at 99% if not increased once more
-                bar.next()
                 break
 
-        bar.finish()
+        report.finishProgress("Preparing dataset", maxArticles)
+        report.measure("ingest")
+        report.measure("preprocess")
+
+        if prefetch:
+            provider.getPipeline().stop()
+            provider.getPipeline().report()
+        if deduplicator != None:
+            deduplicator.report()
         return dataSet
+
+    @staticmethod
+    def ARTICLE_BATCHES(provider: AbstractProvider, preprocessor: Preprocessor, batchSize,
+                        maxArticles = -1, allowedCategories = []) -> Iterator[List[Article]]:
+        #collect up to batchSize articles and preprocess them with one call per preprocessing stage
+        report = RunReport.ACTIVE()
+        report.getPhase("ingest")
+        report.getPhase("preprocess")
+        count = 0
+        batch = []
+        while maxArticles < 0 or count < maxArticles:
+            start = time.perf_counter()
+            try:
+                batch.append(ArticleFactory.GET_NEXT_ARTICLE(provider, allowedCategories))
+            except OutOfArticlesError:
+                break
+            report.record("ingest", 1, seconds=time.perf_counter() - start)
+            count += 1
+
+            #batch is full, hand it over and start a new one
+            if len(batch) >= batchSize:
+                yield SetFactory._PROCESS_BATCH(preprocessor, batch, report)
+                batch = []
+
+        #remaining articles
+        if len(batch) > 0:
+            yield SetFactory._PROCESS_BATCH(preprocessor, batch, report)
+
+        report.measure("ingest")
+        report.measure("preprocess")
+
+    @staticmethod
+    def _PROCESS_BATCH(preprocessor: Preprocessor, batch: List[Article], report: RunReport) -> List[Article]:
+        start = time.perf_counter()
+        batch = preprocessor.processBatch(batch)
+        report.record("preprocess", len(batch), seconds=time.perf_counter() - start)
+        return batch
+
+    @staticmethod
+    def STREAM_BATCHES(batchSize, preprocessor: Preprocessor, maxArticles = -1,
+                       allowedCategories = [], dtype='reuters') -> Iterator[DataSet]:
+        #yield the corpus as a sequence of small datasets.
+        #only the current batch is held in memory, so the corpus size is not limited by RAM
+        provider = ProviderFactory.FACTORY(dtype)
+
+        for articles in SetFactory.ARTICLE_BATCHES(provider, preprocessor, batchSize, maxArticles, allowedCategories):
+            batch = DataSet()
+            for article in articles:
+                batch.append(article)
+            yield batch
+
+    @staticmethod
+    def PREPARE_STORE(preprocessor: Preprocessor, maxArticles = -1, dtype='reuters', batchSize = 500) -> DataSet:
+        #preprocess the whole corpus once, in arrival order and without category limits
+        store = DataSet()
+        provider = ProviderFactory.FACTORY(dtype)
+
+        report = RunReport.ACTIVE()
+        for articles in SetFactory.ARTICLE_BATCHES(provider, preprocessor, batchSize,
+                                                   maxArticles + 1 if maxArticles > -1 else -1):
+            for article in articles:
+                store.append(article)
+                report.progress("Preparing feature store", maxArticles)
+
+        report.finishProgress("Preparing feature store", maxArticles)
+        return store
+
+    @staticmethod
+    def SPLIT_INDICES(categories, trainingArticleCount, allowedCategories = []):
+        #same split as PREPARE_DATASET: the first allowed articles train, the rest test
+        rows = [index for index, category in enumerate(categories)
+                if len(allowedCategories) == 0 or category in allowedCategories]
+        return np.array(rows[:trainingArticleCount], dtype=np.int64), np.array(rows[trainingArticleCount:], dtype=np.int64)
+
+    @staticmethod
+    def FOLD_INDICES(categories, folds = 5, repeats = 1, allowedCategories = [], seed = 0):
+        #stratified k-fold splits as (training, test) index arrays. every category is shuffled
+        #and dealt round robin over the folds, so each fold keeps the category distribution
+        categories = np.asarray(categories)
+        rows = np.array([index for index, category in enumerate(categories)
+                         if len(allowedCategories) == 0 or category in allowedCategories], dtype=np.int64)
+
+        splits = []
+        for repeat in range(repeats):
+            random = np.random.RandomState(seed + repeat)
+            assignment = np.empty(len(rows), dtype=np.int64)
+            #continue dealing where the last category stopped, small categories do not all land in fold 0
+            offset = 0
+            for category in np.unique(categories[rows]):
+                members = np.flatnonzero(categories[rows] == category)
+                assignment[random.permutation(members)] = (np.arange(len(members)) + offset) % folds
+                offset += len(members)
+
+            for fold in range(folds):
+                splits.append((rows[assignment != fold], rows[assignment == fold]))
+        return splits
+
+    @staticmethod
+    def SPLIT(store: DataSet, trainingArticleCount, allowedCategories = []) -> List[DataSet]:
+        training, test = SetFactory.SPLIT_INDICES(store.getCategories(), trainingArticleCount, allowedCategories)
+        return [store.select(training), store.select(test)]
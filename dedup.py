@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import zlib
+
+#data and preprocessing import each other, preprocessing only loads when data comes first
+import data
+from lazy import LazyModule
+from preprocessing import Tokenizer
+
+np = LazyModule("numpy")
+
+
+class MinHashDeduplicator:
+    #detects near duplicate articles with minhash signatures and locality sensitive hashing.
+    #an article is a duplicate if its estimated jaccard similarity to an earlier article reaches the threshold
+
+    #largest prime below 2^32, all hashes stay below 2^64 before the modulo
+    _prime = 4294967291
+
+    def __init__(self, threshold = 0.8, permutations = 128, bands = 32, shingleSize = 3, seed = 1):
+        if permutations % bands != 0:
+            raise ValueError("Permutations must be divisible by bands.")
+
+        self._threshold = threshold
+        self._bands = bands
+        self._rows = permutations // bands
+        self._shingleSize = shingleSize
+        self._tokenizer = Tokenizer(False, False)
+
+        #random universal hash functions, one per permutation
+        random = np.random.RandomState(seed)
+        self._a = random.randint(1, self._prime, size=permutations).astype(np.uint64)
+        self._b = random.randint(0, self._prime, size=permutations).astype(np.uint64)
+
+        self._signatures = []
+        self._buckets = {}
+        self._checked = 0
+        self._dropped = 0
+
+    @property
+    def checked(self) -> int:
+        return self._checked
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def _shingles(self, text: str) -> np.ndarray:
+        #hashed word n-grams of the text
+        words = self._tokenizer.tokenize(text)
+        if len(words) < self._shingleSize:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[index:index + self._shingleSize])
+                        for index in range(len(words) - self._shingleSize + 1)}
+        return np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self._shingles(text)
+        #all permutations for all shingles at once, the minimum per permutation is the signature
+        hashes = (np.outer(shingles, self._a) % self._prime + self._b) % self._prime
+        return hashes.min(axis=0)
+
+    def isDuplicate(self, text: str) -> bool:
+        #checks the text against all earlier texts and remembers it if it is new
+        self._checked += 1
+        signature = self.signature(text)
+
+        keys = [(band, signature[band * self._rows:(band + 1) * self._rows].tobytes())
+                for band in range(self._bands)]
+
+        #only articles sharing at least one band are compared
+        candidates = set()
+        for key in keys:
+            candidates.update(self._buckets.get(key, []))
+
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self._threshold:
+                self._dropped += 1
+                return True
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+        return False
+
+    def report(self) -> None:
+        print("Deduplication: checked " + str(self._checked) + " articles, dropped " + str(self._dropped)
+              + " near duplicates (threshold " + str(self._threshold) + ")")
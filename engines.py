@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+class ParallelOvRSVM:
+    #trains one binary svm per category in a process pool.
+    #the training matrix is written once to disk and memory mapped by every worker
+
+    def __init__(self, bestParams, nJobs = -1, cacheSize = 200):
+        self._bestParams = bestParams
+        self._nJobs = nJobs if nJobs > 0 else os.cpu_count()
+        #every worker has its own kernel cache
+        self._cacheSize = max(50, cacheSize // self._nJobs)
+        self._models = []
+        self.classes_ = np.array([])
+
+    @staticmethod
+    def _fitBinary(featurePath, labelPath, category, bestParams, cacheSize):
+        #attach to the shared matrix, nothing is copied into the worker
+        features = np.load(featurePath, mmap_mode='r')
+        labels = np.load(labelPath, mmap_mode='r')
+
+        svm = EngineFactory.SVC(bestParams, cacheSize)
+        svm.fit(features, labels == category)
+        return svm
+
+    def fit(self, features, categories):
+        self.classes_ = np.unique(np.asarray(categories))
+
+        #spill the training data into memory mapped files, unless it already is
+        directory = None
+        if isinstance(features, np.memmap) and isinstance(categories, np.memmap):
+            featurePath = features.filename
+            labelPath = categories.filename
+        else:
+            directory = tempfile.mkdtemp(prefix="svm_ovr_")
+            featurePath = os.path.join(directory, "features.npy")
+            labelPath = os.path.join(directory, "labels.npy")
+            np.save(featurePath, np.asarray(features, dtype=np.float64))
+            np.save(labelPath, np.asarray(categories))
+
+        try:
+            with ProcessPoolExecutor(max_workers=self._nJobs) as pool:
+                futures = [pool.submit(ParallelOvRSVM._fitBinary, featurePath, labelPath,
+                                       category, self._bestParams, self._cacheSize) for category in self.classes_]
+                self._models = [future.result() for future in futures]
+        finally:
+            if directory != None:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        return self
+
+    def decision_function(self, features):
+        #one column per category, positive values vote for the category
+        return np.column_stack([model.decision_function(features) for model in self._models])
+
+    def predict(self, features):
+        return self.classes_[np.argmax(self.decision_function(features), axis=1)]
+
+
+class ApproximateKernelSVM:
+    #maps the features through an approximate kernel feature map and trains a linear svm on the result.
+    #fit time grows linearly with the number of articles instead of quadratically
+
+    def __init__(self, bestParams, components = 1000, method = 'nystroem'):
+        self._bestParams = bestParams
+        self._components = components
+        self._method = method
+        self._model = None
+        self.classes_ = np.array([])
+
+    def _getFeatureMap(self):
+        from sklearn.kernel_approximation import Nystroem, RBFSampler
+
+        #random fourier features only exist for the rbf kernel
+        if self._method == 'fourier' and self._bestParams["kernel"] == 'rbf':
+            return RBFSampler(gamma=self._bestParams["gamma"], n_components=self._components, random_state=0)
+
+        return Nystroem(kernel=self._bestParams["kernel"], gamma=self._bestParams["gamma"],
+                        degree=self._bestParams.get("degree", 3), coef0=0.1,
+                        n_components=self._components, random_state=0)
+
+    def fit(self, features, categories):
+        from sklearn.pipeline import make_pipeline
+        from sklearn.svm import LinearSVC
+
+        self._model = make_pipeline(self._getFeatureMap(), LinearSVC(C=self._bestParams["C"], tol=0.001))
+        self._model.fit(features, categories)
+        self.classes_ = self._model.classes_
+        return self
+
+    def decision_function(self, features):
+        return self._model.decision_function(features)
+
+    def predict(self, features):
+        return self._model.predict(features)
+
+
+class RegularizationPath:
+    #cross validates one kernel setting for increasing C values. the solutions along the path share
+    #the kernel, so the kernel matrix is computed once and every C value and fold fits on slices of it.
+    #libsvm can not be warm started from sklearn, sharing the kernel is the reusable part of the path.
+    #the kernel matrix is dense, n x n float64 for n training articles, in every worker
+
+    def __init__(self, params: dict, Cs = [1, 100, 1000], folds = 5):
+        self._params = params
+        self._Cs = sorted(Cs)
+        self._folds = folds
+
+    def _gram(self, features):
+        from sklearn.metrics.pairwise import pairwise_kernels
+
+        #same kernel parameters as SVC(kernel=...) with its default coef0
+        kernel = self._params["kernel"]
+        if kernel == 'linear':
+            return pairwise_kernels(features, metric='linear')
+        if kernel == 'poly':
+            return pairwise_kernels(features, metric='poly', gamma=self._params["gamma"],
+                                    degree=self._params["degree"], coef0=0.0)
+        return pairwise_kernels(features, metric=kernel, gamma=self._params["gamma"])
+
+    def crossValidate(self, features, categories) -> dict:
+        from sklearn.model_selection import StratifiedKFold
+        from sklearn.svm import SVC
+
+        features = np.asarray(features, dtype=np.float64)
+        categories = np.asarray(categories)
+
+        start = time.perf_counter()
+        gram = self._gram(features)
+        kernelTime = time.perf_counter() - start
+
+        #same folds as GridSearchCV(cv=5)
+        start = time.perf_counter()
+        scores = {C: [] for C in self._Cs}
+        splits = list(StratifiedKFold(self._folds).split(features, categories))
+        for training, test in splits:
+            trainingGram = gram[np.ix_(training, training)]
+            testGram = gram[np.ix_(test, training)]
+            for C in self._Cs:
+                svm = SVC(kernel='precomputed', C=C)
+                svm.fit(trainingGram, categories[training])
+                scores[C].append(svm.score(testGram, categories[test]))
+        fitTime = time.perf_counter() - start
+
+        #one independent fit of the largest C as reference for the time saved
+        training, test = splits[0]
+        params = dict(self._params, coef0=0.0) if self._params["kernel"] == 'poly' else self._params
+        svm = SVC(C=self._Cs[-1], **params)
+        start = time.perf_counter()
+        svm.fit(features[training], categories[training])
+        svm.score(features[test], categories[test])
+        referenceTime = time.perf_counter() - start
+
+        return {"scores": {C: float(np.mean(values)) for C, values in scores.items()},
+                "kernelTime": kernelTime, "fitTime": fitTime,
+                "independentTime": referenceTime * len(self._Cs) * len(splits)}
+
+    @staticmethod
+    def _crossValidateAttached(directory, params, Cs, folds) -> dict:
+        from data import DataSet
+
+        features, categories = DataSet.ATTACH(directory)
+        return RegularizationPath(params, Cs, folds).crossValidate(features, categories)
+
+    @staticmethod
+    def _GROUPS(paramGrid: list) -> list:
+        #every combination of the non C parameters is one path
+        from sklearn.model_selection import ParameterGrid
+
+        groups = []
+        for grid in paramGrid:
+            others = {name: values for name, values in grid.items() if name != 'C'}
+            for params in ParameterGrid(others):
+                groups.append((params, grid['C']))
+        return groups
+
+    @staticmethod
+    def _KEY(params: dict) -> tuple:
+        #the linear kernel ignores gamma and degree, these groups are fitted once
+        if params["kernel"] == 'linear':
+            return ('linear',)
+        return tuple(sorted(params.items()))
+
+    @staticmethod
+    def GRID_SEARCH(features, categories, paramGrid: list, folds = 5, nJobs = 1, directory = None) -> dict:
+        #grid search like GridSearchCV(SVC(), paramGrid, cv=folds), with one path per group.
+        #with nJobs != 1 the groups run in a process pool attached to the spilled training set
+        groups = RegularizationPath._GROUPS(paramGrid)
+        unique = {}
+        for params, Cs in groups:
+            unique.setdefault(RegularizationPath._KEY(params), (params, Cs))
+
+        if nJobs == 1 or directory == None:
+            results = {key: RegularizationPath(params, Cs, folds).crossValidate(features, categories)
+                       for key, (params, Cs) in unique.items()}
+        else:
+            with ProcessPoolExecutor(max_workers=nJobs if nJobs > 0 else os.cpu_count()) as pool:
+                futures = {key: pool.submit(RegularizationPath._crossValidateAttached, directory, params, Cs, folds)
+                           for key, (params, Cs) in unique.items()}
+                results = {key: future.result() for key, future in futures.items()}
+
+        #best candidate in the candidate order of GridSearchCV (ParameterGrid), ties go to the first one
+        from sklearn.model_selection import ParameterGrid
+
+        bestParams = None
+        bestScore = -1.0
+        for candidate in ParameterGrid(paramGrid):
+            params = {name: value for name, value in candidate.items() if name != 'C'}
+            score = results[RegularizationPath._KEY(params)]["scores"][candidate['C']]
+            if score > bestScore:
+                bestScore = score
+                bestParams = candidate
+
+        saved = 0.0
+        print("----------------------------------------------")
+        print("group | C values x folds | kernel | path fits | independent fits (estimated) | saved")
+        for params, Cs in groups:
+            key = RegularizationPath._KEY(params)
+            result = results[key]
+
+            name = ", ".join([name + "=" + str(value) for name, value in params.items()])
+            if unique[key][0] is not params:
+                print(name + " | same as " + ", ".join([n + "=" + str(v) for n, v in unique[key][0].items()])
+                      + " | - | - | - | " + str(round(result["independentTime"], 3)) + "s")
+                saved += result["independentTime"]
+                continue
+
+            #without the path the kernel is evaluated again in every single fit
+            pathTime = result["kernelTime"] + result["fitTime"]
+            print(name + " | " + str(len(Cs)) + " x " + str(folds) + " | " + str(round(result["kernelTime"], 3))
+                  + "s | " + str(round(result["fitTime"], 3)) + "s | " + str(round(result["independentTime"], 3))
+                  + "s | " + str(round(result["independentTime"] - pathTime, 3)) + "s")
+            saved += result["independentTime"] - pathTime
+
+        print("Total time saved (estimated): " + str(round(saved, 3)) + "s")
+        print("Best score: " + str(bestScore))
+        return bestParams
+
+
+class EngineTuner:
+    #chooses the engine from the size and sparsity of the training set, the free memory and cores
+    #and an optional time budget. fit times are extrapolated from fits on small samples
+
+    def __init__(self, timeBudget = -1, memoryBudget = -1, probeSize = 500, components = 1000):
+        #seconds and megabytes, -1 means no limit
+        self._timeBudget = timeBudget
+        self._memoryBudget = memoryBudget
+        self._probeSize = probeSize
+        self._components = components
+
+    @staticmethod
+    def AVAILABLE_MEMORY() -> int:
+        #free physical memory in megabytes, -1 if the platform does not tell
+        try:
+            return int(os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2 ** 20)
+        except (ValueError, OSError, AttributeError):
+            return -1
+
+    def _memoryLimit(self) -> int:
+        available = EngineTuner.AVAILABLE_MEMORY()
+        if self._memoryBudget > 0 and available > 0:
+            return min(self._memoryBudget, available)
+        return self._memoryBudget if self._memoryBudget > 0 else available
+
+    @staticmethod
+    def _timeFit(svm, features, categories) -> float:
+        start = time.perf_counter()
+        svm.fit(features, categories)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _rows(features, rows):
+        #copy only the sampled rows, the training set may be a list of rows or a memory map
+        if isinstance(features, list):
+            return np.asarray([features[row] for row in rows], dtype=np.float64)
+        return np.asarray(features[rows], dtype=np.float64)
+
+    def _probe(self, bestParams, features, categories, engine, size) -> float:
+        random = np.random.RandomState(0)
+        rows = np.sort(random.choice(len(categories), size, replace=False))
+        return EngineTuner._timeFit(EngineFactory.FACTORY(bestParams, engine, 1, min(self._components, size)),
+                                    EngineTuner._rows(features, rows), categories[rows])
+
+    def _estimate(self, bestParams, features, categories, engine) -> float:
+        #fit time on two sample sizes gives the growth exponent, clamped to what the solvers do
+        count = len(categories)
+        if count <= 2 * self._probeSize:
+            return self._probe(bestParams, features, categories, engine, count)
+
+        small = self._probe(bestParams, features, categories, engine, self._probeSize)
+        large = self._probe(bestParams, features, categories, engine, 2 * self._probeSize)
+        exponent = np.log2(large / small) if small > 0 and large > 0 else 2.0
+        exponent = min(3.0, max(1.0, exponent))
+        return large * (count / (2 * self._probeSize)) ** exponent
+
+    def tune(self, bestParams, features, categories) -> dict:
+        categories = np.asarray(categories)
+        count = len(categories)
+        #size and sparsity from a sample, the training set is not copied
+        sample = EngineTuner._rows(features, np.arange(min(count, 2 * self._probeSize)))
+        dimensions = sample.shape[1]
+        density = np.count_nonzero(sample) / sample.size if sample.size > 0 else 0.0
+        memory = self._memoryLimit()
+        cores = os.cpu_count()
+
+        reasons = [str(count) + " articles, " + str(dimensions) + " features, density " + str(round(density, 4))
+                   + ", " + str(memory) + " MB memory, " + str(cores) + " cores"]
+
+        #libsvm caches kernel rows as 32 bit floats, a cache holding all rows avoids recomputing them.
+        #half of the memory is left for the data and the solver, 1 MB is the smallest cache libsvm uses
+        kernelSize = int(count * count * 4 / 2 ** 20) + 1
+        cacheLimit = memory // 2 if memory > 0 else 200
+        cacheSize = max(1, min(kernelSize, cacheLimit))
+        reasons.append("kernel matrix " + str(kernelSize) + " MB, kernel cache " + str(cacheSize) + " MB")
+
+        #the approximate feature map has to fit into the other half of the memory
+        components = min(self._components, count)
+        if memory > 0:
+            components = max(1, min(components, int(memory * 2 ** 20 / 2 / (8 * count))))
+
+        decision = {"engine": 'exact', "cacheSize": cacheSize, "components": components, "reasons": reasons}
+
+        #linear kernels do not need libsvm, the linear solver scales with the number of articles
+        if bestParams["kernel"] == 'linear':
+            decision["engine"] = 'linear'
+            reasons.append("linear kernel, using the linear engine")
+            return EngineTuner._log(decision)
+
+        #engines within the memory budget, ordered by accuracy. the linear engine always fits
+        candidates = []
+        if kernelSize <= cacheLimit:
+            candidates.append('exact')
+        else:
+            reasons.append("kernel matrix exceeds the memory budget, exact kernel would recompute kernel rows")
+        if components >= min(100, count):
+            candidates.append('nystroem')
+        else:
+            reasons.append("only " + str(components) + " approximate components fit the memory budget")
+        candidates.append('linear')
+
+        if self._timeBudget <= 0:
+            decision["engine"] = candidates[0]
+            reasons.append("no time budget, using the most accurate engine within the memory budget")
+            return EngineTuner._log(decision)
+
+        estimates = {}
+        for engine in candidates:
+            estimates[engine] = self._estimate(bestParams, features, categories, engine)
+            reasons.append("estimated fit time " + engine + ": " + str(round(estimates[engine], 4)) + "s")
+
+            #take the first one within the budget
+            if estimates[engine] <= self._timeBudget:
+                decision["engine"] = engine
+                reasons.append(engine + " fits the budget of " + str(self._timeBudget) + "s")
+                return EngineTuner._log(decision)
+
+        decision["engine"] = min(estimates, key=estimates.get)
+        reasons.append("no engine fits the budget of " + str(self._timeBudget) + "s, using the fastest")
+        return EngineTuner._log(decision)
+
+    @staticmethod
+    def _log(decision: dict) -> dict:
+        print("autotune: " + decision["engine"])
+        for reason in decision["reasons"]:
+            print("  " + reason)
+        return decision
+
+
+class EngineFactory:
+
+    @staticmethod
+    def SVC(bestParams, cacheSize = 200) -> SVC:
+        from sklearn.svm import SVC
+
+        #check for degree, wich is not in the array for most kernels
+        if 'degree' in bestParams:
+            #init svm
+            return SVC(kernel=bestParams["kernel"], C=bestParams["C"], degree=bestParams["degree"], gamma=bestParams["gamma"],
+                        coef0=0.1, shrinking=True, decision_function_shape="ovr",
+                        tol=0.001, cache_size=cacheSize, verbose=False, max_iter=-1)
+
+        #init svm
+        return SVC(kernel=bestParams["kernel"], C=bestParams["C"], gamma=bestParams["gamma"],
+                    coef0=0.1, shrinking=True, decision_function_shape="ovr",
+                    tol=0.001, cache_size=cacheSize, verbose=False, max_iter=-1)
+
+    @staticmethod
+    def FACTORY(bestParams, engine = 'exact', nJobs = -1, components = 1000, cacheSize = 200):
+        #parallel one-vs-rest binary svms
+        if engine == 'ovr':
+            return ParallelOvRSVM(bestParams, nJobs, cacheSize)
+
+        #linear svm on an approximate kernel feature map
+        if engine == 'nystroem' or engine == 'fourier':
+            return ApproximateKernelSVM(bestParams, components, engine)
+
+        #linear svm on the features themselves
+        if engine == 'linear':
+            from sklearn.svm import LinearSVC
+            return LinearSVC(C=bestParams["C"], tol=0.001)
+
+        #exact libsvm svm
+        return EngineFactory.SVC(bestParams, cacheSize)
@@ -0,0 +1,146 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import Cache
+from data import DataSet, SetFactory
+from engines import EngineFactory
+from preprocessing import PreprocessorFactory
+from report import RunReport
+from svm import Scores
+
+
+class ExperimentRunner:
+    #preprocesses the corpus once into a labelled feature store.
+    #every experiment is a row selection on that store and they are trained concurrently
+
+    def __init__(self, dtype = 'reuters'):
+        #init cache
+        self._cache = Cache()
+
+        #get preprocessors
+        preprocessor = PreprocessorFactory.FACTORY(list(
+            self._cache.words.keys()))
+
+        #preprocess the whole corpus, once
+        self._store = SetFactory.PREPARE_STORE(preprocessor, self._cache.articleCount, dtype)
+        self._experiments = []
+
+    def getStore(self) -> DataSet:
+        return self._store
+
+    def _getCategories(self, limitCategories):
+        #check if categories are limited
+        if limitCategories > 0:
+            return [item[0] for item in list(self._cache.categories.most_common(limitCategories))]
+        return []
+
+    def addExperiment(self, name, limitCategories, bestParams, engine = 'exact'):
+        self._experiments.append({
+            "name": name,
+            "categories": self._getCategories(limitCategories),
+            "bestParams": bestParams,
+            "engine": engine
+        })
+
+    @staticmethod
+    def _runExperiment(directory, training, test, bestParams, engine):
+        #attach to the shared store and select the rows of this experiment
+        features, categories = DataSet.ATTACH(directory)
+
+        #parallel engines would oversubscribe the pool, each experiment uses one core
+        svm = EngineFactory.FACTORY(bestParams, engine, 1)
+
+        start = time.perf_counter()
+        svm.fit(features[training], categories[training])
+        fitTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predicted = svm.predict(features[test])
+        predictTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = Scores.CALCULATE(categories[test], predicted)
+        scores["fitTime"] = fitTime
+        scores["predictTime"] = predictTime
+        scores["scoreTime"] = time.perf_counter() - start
+        #the parent only sees its own memory, pools reuse workers so this is the peak of all their runs
+        scores["peakRss"] = RunReport.PEAK_RSS()
+        return scores
+
+    @staticmethod
+    def _measure(report: RunReport, results) -> None:
+        #fit, predict and score run in the same workers, their peak is reported for all three
+        peaks = [scores["peakRss"] for scores in results if scores["peakRss"] != None]
+        for phase in ["fit", "predict", "score"]:
+            report.measure(phase, max(peaks) if len(peaks) > 0 else None)
+
+    def run(self, nJobs = -1) -> dict:
+        #share the store with the workers through a memory map
+        directory = self._store.spill()
+        trainingArticleCount = int(self._cache.articleCount / 2)
+
+        report = RunReport.ACTIVE()
+        for phase in ["fit", "predict", "score"]:
+            report.getPhase(phase)
+
+        print("running " + str(len(self._experiments)) + " experiments ...")
+        with ProcessPoolExecutor(max_workers=nJobs if nJobs > 0 else os.cpu_count()) as pool:
+            futures = {}
+            sizes = {}
+            for experiment in self._experiments:
+                training, test = SetFactory.SPLIT_INDICES(self._store.getCategories(), trainingArticleCount,
+                                                          experiment["categories"])
+                sizes[experiment["name"]] = (len(training), len(test))
+                futures[experiment["name"]] = pool.submit(ExperimentRunner._runExperiment, directory,
+                                                          training, test, experiment["bestParams"],
+                                                          experiment["engine"])
+
+            results = {name: future.result() for name, future in futures.items()}
+
+        #the workers only return their timings and memory, add them to the report of this run
+        for experiment in self._experiments:
+            scores = results[experiment["name"]]
+            training, test = sizes[experiment["name"]]
+            report.record("fit", training, seconds=scores["fitTime"])
+            report.record("predict", test, seconds=scores["predictTime"])
+            report.record("score", test, seconds=scores["scoreTime"])
+        ExperimentRunner._measure(report, results.values())
+
+        for experiment in self._experiments:
+            print("----------------------------------------------")
+            print(experiment["name"] + ", with params: ")
+            print(experiment["bestParams"])
+            Scores.PRINT(results[experiment["name"]])
+
+        return results
+
+    def crossValidate(self, name, limitCategories, bestParams, folds = 5, repeats = 1, engine = 'exact',
+                      nJobs = -1) -> dict:
+        #stratified k-fold evaluation on the store, the folds are fitted and scored concurrently
+        directory = self._store.spill()
+        splits = SetFactory.FOLD_INDICES(self._store.getCategories(), folds, repeats,
+                                         self._getCategories(limitCategories))
+
+        report = RunReport.ACTIVE()
+        for phase in ["fit", "predict", "score"]:
+            report.getPhase(phase)
+
+        print("running " + str(len(splits)) + " folds ...")
+        with ProcessPoolExecutor(max_workers=nJobs if nJobs > 0 else os.cpu_count()) as pool:
+            futures = [pool.submit(ExperimentRunner._runExperiment, directory, training, test, bestParams, engine)
+                       for training, test in splits]
+            results = [future.result() for future in futures]
+
+        for (training, test), scores in zip(splits, results):
+            report.record("fit", len(training), seconds=scores["fitTime"])
+            report.record("predict", len(test), seconds=scores["predictTime"])
+            report.record("score", len(test), seconds=scores["scoreTime"])
+        ExperimentRunner._measure(report, results)
+
+        summary = Scores.SUMMARIZE(results)
+        print("----------------------------------------------")
+        print(name + ", " + str(folds) + " folds x " + str(repeats) + ", with params: ")
+        print(bestParams)
+        Scores.PRINT_SUMMARY(summary, len(results))
+        return summary
@@ -0,0 +1,143 @@
+import json
+import time
+from typing import List
+
+from data import Article, ArticleFactory, OutOfArticlesError, ProviderFactory
+from preprocessing import PreprocessorFactory, Tokenizer
+
+
+class GoldenHarness:
+    #records the output of the current preprocessing pipeline on a fixed sample and checks
+    #alternative implementations against it. engines get fresh articles and the vocabulary and
+    #return any of "tokens", "stems" (words after CACHE_FACTORY) and "vectors" (after FACTORY)
+
+    _fileName = "golden.json"
+    _kinds = ["tokens", "stems", "vectors"]
+
+    def __init__(self, vocabulary: List[str], sampleSize = 200, dtype = 'reuters'):
+        self._vocabulary = vocabulary
+        self._sampleSize = sampleSize
+        self._dtype = dtype
+        self._engines = {"batch": GoldenHarness.BATCH_ENGINE}
+
+    def addEngine(self, name, engine) -> None:
+        self._engines[name] = engine
+
+    @staticmethod
+    def REFERENCE_ENGINE(articles: List[Article], vocabulary: List[str]) -> dict:
+        #the pipeline as it is used today, one article at a time
+        tokenizer = Tokenizer(False, False)
+        stemmer = PreprocessorFactory.CACHE_FACTORY()
+        vectorizer = PreprocessorFactory.CREATE(vocabulary)
+        return {
+            "tokens": [tokenizer.tokenize(article.text) for article in articles],
+            "stems": [stemmer.processWords(article.text) for article in articles],
+            "vectors": [list(vectorizer.process(article).preprocessed.values()) for article in articles]
+        }
+
+    @staticmethod
+    def BATCH_ENGINE(articles: List[Article], vocabulary: List[str]) -> dict:
+        #batch api of the preprocessors
+        stemmer = PreprocessorFactory.CACHE_FACTORY()
+        words, offsets = stemmer.processWordsBatch([article.text for article in articles])
+        vectorizer = PreprocessorFactory.CREATE(vocabulary)
+        return {
+            "stems": [words[offsets[index]:offsets[index + 1]] for index in range(len(articles))],
+            "vectors": [list(article.preprocessed.values()) for article in vectorizer.processBatch(articles)]
+        }
+
+    @staticmethod
+    def _sparse(vector: List[int]) -> dict:
+        #vectors are mostly zeros, only keep the length and the non zero entries
+        return {"length": len(vector), "nonzero": [[index, value] for index, value in enumerate(vector) if value != 0]}
+
+    @staticmethod
+    def _describe(expected, got) -> str:
+        #first position where the outputs differ
+        if isinstance(expected, dict):
+            if expected["length"] != got["length"]:
+                return "length " + str(expected["length"]) + " != " + str(got["length"])
+            expected = expected["nonzero"]
+            got = got["nonzero"]
+
+        for position in range(min(len(expected), len(got))):
+            if expected[position] != got[position]:
+                return "at " + str(position) + " expected " + str(expected[position]) + ", got " + str(got[position])
+        return "length " + str(len(expected)) + " != " + str(len(got))
+
+    def _articles(self, sample: List[dict]) -> List[Article]:
+        return [Article(item["text"], item["category"]) for item in sample]
+
+    def record(self) -> None:
+        #take the first articles of the corpus as the fixed sample
+        provider = ProviderFactory.FACTORY(self._dtype)
+        sample = []
+        while len(sample) < self._sampleSize:
+            try:
+                article = ArticleFactory.GET_NEXT_ARTICLE(provider)
+            except OutOfArticlesError:
+                break
+            sample.append({"text": article.text, "category": article.category})
+
+        reference = GoldenHarness.REFERENCE_ENGINE(self._articles(sample), self._vocabulary)
+        reference["vectors"] = [GoldenHarness._sparse(vector) for vector in reference["vectors"]]
+
+        golden = {"vocabulary": self._vocabulary, "sample": sample, "reference": reference}
+        file = open(self._fileName, "w+")
+        file.write(json.dumps(golden))
+        file.close()
+
+        print("Recorded " + str(len(sample)) + " reference articles")
+
+    def _timed(self, engine, sample, vocabulary):
+        articles = self._articles(sample)
+        start = time.perf_counter()
+        result = engine(articles, vocabulary)
+        return result, time.perf_counter() - start
+
+    def check(self) -> dict:
+        try:
+            with open(self._fileName, "r") as file:
+                golden = json.load(file)
+        except FileNotFoundError:
+            self.record()
+            return self.check()
+
+        sample = golden["sample"]
+        vocabulary = golden["vocabulary"]
+        reference = golden["reference"]
+
+        #the reference pipeline is timed again, so the ratios compare like with like
+        _, referenceTime = self._timed(GoldenHarness.REFERENCE_ENGINE, sample, vocabulary)
+
+        results = {}
+        for name, engine in self._engines.items():
+            result, engineTime = self._timed(engine, sample, vocabulary)
+            if "vectors" in result:
+                result["vectors"] = [GoldenHarness._sparse(vector) for vector in result["vectors"]]
+
+            diffs = {}
+            for kind in self._kinds:
+                if kind not in result:
+                    continue
+
+                diffs[kind] = [index for index in range(len(sample)) if result[kind][index] != reference[kind][index]]
+                #show the first difference to make debugging easier
+                if len(diffs[kind]) > 0:
+                    index = diffs[kind][0]
+                    print(name + " " + kind + " differ in article " + str(index) + ": "
+                          + GoldenHarness._describe(reference[kind][index], result[kind][index]))
+
+            results[name] = {
+                "diffs": {kind: len(indices) for kind, indices in diffs.items()},
+                "articlesPerSecond": len(sample) / engineTime if engineTime > 0 else 0.0,
+                "speedup": referenceTime / engineTime if engineTime > 0 else 0.0
+            }
+
+        print("----------------------------------------------")
+        print("reference: " + str(round(len(sample) / referenceTime, 1)) + " articles/s")
+        print("engine | tokens | stems | vectors | articles/s | speedup")
+        for name, result in results.items():
+            print(name + " | " + " | ".join([str(result["diffs"].get(kind, "-")) for kind in self._kinds])
+                  + " | " + str(round(result["articlesPerSecond"], 1)) + " | " + str(round(result["speedup"], 2)))
+        return results
@@ -0,0 +1,27 @@
+import time
+from collections import Counter
+from data import ReutersIndex
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+print("----------------------------------------------")
+print("Indexing Reuters corpus ...")
+
+index = ReutersIndex.BUILD()
+index.save()
+
+print("Indexed articles: " + str(len(index)))
+print("Most common topics: ")
+print(Counter([entry['topic'] for entry in index.entries if entry['topic'] != None]).most_common(10))
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------
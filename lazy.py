@@ -0,0 +1,15 @@
+import importlib
+
+
+class LazyModule:
+    #stands in for a heavy module and only imports it on first use,
+    #so e.g. reading the cache does not pay for numpy
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module == None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
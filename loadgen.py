@@ -0,0 +1,158 @@
+import json
+import queue
+import threading
+import time
+from typing import List
+
+from cache import Cache
+from data import ArticleFactory, Article, OutOfArticlesError, ProviderFactory
+from lazy import LazyModule
+from preprocessing import PreprocessorFactory
+
+np = LazyModule("numpy")
+
+
+class LoadGenerator:
+    #replays corpus documents against the in-process classification path (Preprocessor.process
+    #followed by predict) with many concurrent callers and records the latency of every document.
+    #with a rate the documents arrive on a fixed schedule and waiting in the queue counts as latency,
+    #without one every caller sends its next document as soon as the last one is answered
+
+    _fileName = "loadgen.json"
+    #histogram bucket bounds in milliseconds
+    _buckets = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+    def __init__(self, model, dtype = 'reuters', documents = 1000):
+        self._model = model
+        self._words = list(Cache(dtype).words.keys())
+        self._texts = LoadGenerator.LOAD_TEXTS(dtype, documents)
+        self._results = []
+
+    @staticmethod
+    def LOAD_TEXTS(dtype, documents) -> List[str]:
+        provider = ProviderFactory.FACTORY(dtype)
+        texts = []
+        while len(texts) < documents:
+            try:
+                texts.append(ArticleFactory.GET_NEXT_ARTICLE(provider).text)
+            except OutOfArticlesError:
+                break
+        return texts
+
+    def _classify(self, preprocessor, text: str) -> str:
+        vector = preprocessor.process(Article(text, "unknown")).normalized
+        return self._model.predict([vector])[0]
+
+    def _work(self, requests: queue.Queue, latencies: list, services: list, failures: list) -> None:
+        #every caller has its own preprocessor, the shared one is not meant for concurrent use
+        preprocessor = PreprocessorFactory.CREATE(self._words)
+        while True:
+            request = requests.get()
+            if request == None:
+                return
+
+            index, arrival = request
+            start = time.perf_counter()
+            #closed loop: the caller sends when it is ready, the latency starts now
+            if arrival == None:
+                arrival = start
+            try:
+                self._classify(preprocessor, self._texts[index % len(self._texts)])
+            except Exception as error:
+                #a failed request is counted, the caller goes on with the next one
+                failures.append(type(error).__name__ + ": " + str(error))
+                continue
+            end = time.perf_counter()
+
+            #list.append is atomic, no lock needed
+            latencies.append(end - arrival)
+            services.append(end - start)
+
+    def run(self, concurrency = 4, rate = -1, requestCount = -1) -> dict:
+        #rate in documents per second, -1 sends as fast as the callers answer
+        if requestCount < 0:
+            requestCount = len(self._texts)
+
+        requests = queue.Queue()
+        latencies = []
+        services = []
+        failures = []
+        workers = [threading.Thread(target=self._work, args=(requests, latencies, services, failures), daemon=True)
+                   for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+
+        start = time.perf_counter()
+        for index in range(requestCount):
+            if rate > 0:
+                #open loop: the arrival time is fixed by the schedule, not by the callers
+                arrival = start + index / rate
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                arrival = None
+            requests.put((index, arrival))
+
+        for _ in workers:
+            requests.put(None)
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+
+        result = LoadGenerator.SUMMARIZE(latencies, services, seconds)
+        #latencies and throughput only cover the answered requests
+        result["failures"] = len(failures)
+        if len(failures) > 0:
+            print(str(len(failures)) + " of " + str(requestCount) + " requests failed, first: " + failures[0])
+        result["concurrency"] = concurrency
+        result["rate"] = rate
+        self._results.append(result)
+        return result
+
+    @staticmethod
+    def SUMMARIZE(latencies: list, services: list, seconds: float) -> dict:
+        milliseconds = np.array(latencies) * 1000
+        counts, _ = np.histogram(milliseconds, bins=[0] + LoadGenerator._buckets + [np.inf])
+        if len(latencies) == 0:
+            #every request failed
+            milliseconds = np.zeros(1)
+            services = [0.0]
+        return {
+            "requests": len(latencies),
+            "seconds": seconds,
+            "throughput": len(latencies) / seconds if seconds > 0 else 0.0,
+            "p50": float(np.percentile(milliseconds, 50)),
+            "p95": float(np.percentile(milliseconds, 95)),
+            "p99": float(np.percentile(milliseconds, 99)),
+            "max": float(milliseconds.max()),
+            "service": float(np.mean(services) * 1000),
+            "histogram": [int(count) for count in counts]
+        }
+
+    @staticmethod
+    def PRINT_HISTOGRAM(result: dict, width = 50) -> None:
+        counts = result["histogram"]
+        largest = max(counts) if max(counts) > 0 else 1
+        bounds = ["<= " + str(bound) for bound in LoadGenerator._buckets] + ["> " + str(LoadGenerator._buckets[-1])]
+        print("latency (ms) | count")
+        for bound, count in zip(bounds, counts):
+            print(bound.rjust(9) + " | " + "#" * int(width * count / largest) + " " + str(count))
+
+    def sweep(self, concurrencies = [1, 2, 4, 8], rates = [-1], requestCount = -1) -> list:
+        #throughput curve: every combination of concurrency and rate
+        results = [self.run(concurrency, rate, requestCount) for rate in rates for concurrency in concurrencies]
+
+        print("----------------------------------------------")
+        print("concurrency | rate | documents/s | p50 ms | p95 ms | p99 ms | service ms | failed")
+        for result in results:
+            print(str(result["concurrency"]) + " | " + (str(result["rate"]) if result["rate"] > 0 else "max")
+                  + " | " + str(round(result["throughput"], 1)) + " | " + str(round(result["p50"], 2))
+                  + " | " + str(round(result["p95"], 2)) + " | " + str(round(result["p99"], 2))
+                  + " | " + str(round(result["service"], 2)) + " | " + str(result["failures"]))
+        return results
+
+    def write(self) -> None:
+        file = open(self._fileName, "w+")
+        file.write(json.dumps({"buckets": LoadGenerator._buckets, "runs": self._results}, indent=2))
+        file.close()
@@ -0,0 +1,48 @@
+import time
+from cache import Cache
+from loadgen import LoadGenerator
+from report import RunReport
+from svm import SVMWrapper
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+#no progress output while measuring latencies
+RunReport.START("loadgenMain", progress=False)
+
+dtype = 'reuters'
+#dtype = 'twentyNews'
+
+#callers and documents per second to replay, -1 sends as fast as possible
+concurrencies = [1, 2, 4, 8, 16]
+rates = [-1]
+documents = 1000
+
+cache = Cache(dtype)
+
+print("----------------------------------------------")
+print("fitting the model, all Categories, with params: ")
+print(cache.bestParamsLarge)
+wrapper = SVMWrapper(-1, dtype)
+wrapper.processDataset(cache.bestParamsLarge, False)
+
+generator = LoadGenerator(wrapper.getModel(), dtype, documents)
+results = generator.sweep(concurrencies, rates)
+
+#latencies at the highest throughput
+best = max(results, key=lambda result: result["throughput"])
+print("----------------------------------------------")
+print("Saturation: " + str(round(best["throughput"], 1)) + " documents/s with " + str(best["concurrency"]) + " callers")
+LoadGenerator.PRINT_HISTOGRAM(best)
+generator.write()
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------
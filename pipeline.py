@@ -0,0 +1,246 @@
+import os
+import queue
+import threading
+import time
+from typing import Iterator
+
+from data import AbstractProvider, Article, ArticleFactory, CorpusFile, OutOfArticlesError, ReutersProvider, \
+    SoupLoader, TagListLoader, TwentyNewsArchive, TwentyNewsProvider
+from report import RunReport
+
+
+class _Failure:
+    #carries an exception of a stage to the consumer
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class Stage(threading.Thread):
+    #one step of the pipeline. takes items from its input queue, puts the results into the bounded output queue
+
+    _end = object()
+
+    def __init__(self, name, work, inputQueue: queue.Queue, outputQueue: queue.Queue, stopped: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self._work = work
+        self._input = inputQueue
+        self._output = outputQueue
+        self._stopped = stopped
+
+        #utilization counters
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def _put(self, item) -> bool:
+        #a full output queue blocks the stage (backpressure) until the consumer catches up or stops
+        start = time.perf_counter()
+        while not self._stopped.is_set():
+            try:
+                self._output.put(item, timeout=0.1)
+                self.blocked += time.perf_counter() - start
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self):
+        #waits for the next item like _put waits for space, None if the pipeline was stopped meanwhile
+        start = time.perf_counter()
+        while not self._stopped.is_set():
+            try:
+                item = self._input.get(timeout=0.1)
+                self.starved += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                pass
+        self.starved += time.perf_counter() - start
+        return None
+
+    def run(self):
+        while not self._stopped.is_set():
+            item = self._get()
+            if item == None:
+                return
+
+            #forward end of stream and failures
+            if item is Stage._end or isinstance(item, _Failure):
+                self._put(item)
+                return
+
+            try:
+                results = iter(self._work(item))
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        result = next(results)
+                    except StopIteration:
+                        self.busy += time.perf_counter() - start
+                        break
+                    self.busy += time.perf_counter() - start
+
+                    self.items += 1
+                    if not self._put(result):
+                        return
+            except Exception as error:
+                self._put(_Failure(error))
+                return
+
+
+class PrefetchPipeline:
+    #reader thread -> parse thread -> preprocess thread, connected by bounded queues
+
+    def __init__(self, dtype = 'reuters', preprocessor = None, allowedCategories = [],
+                 prefetchFiles = 2, queueSize = 200):
+        self._dtype = dtype
+        self._preprocessor = preprocessor
+        self._allowedCategories = allowedCategories
+        self._stopped = threading.Event()
+        self._stages = []
+
+        #all files are known upfront
+        sources = queue.Queue()
+        for source in self._getSources():
+            sources.put(source)
+        sources.put(Stage._end)
+
+        files = queue.Queue(maxsize=prefetchFiles)
+        articles = queue.Queue(maxsize=queueSize)
+        self._stages.append(Stage("read", self._read, sources, files, self._stopped))
+        self._stages.append(Stage("parse", self._parse, files, articles, self._stopped))
+
+        #preprocessing is optional, e.g. when the consumer preprocesses on its own
+        if preprocessor != None:
+            processed = queue.Queue(maxsize=queueSize)
+            self._stages.append(Stage("preprocess", self._preprocess, articles, processed, self._stopped))
+            articles = processed
+
+        self._output = articles
+        self._started = None
+        self._consumerWaiting = 0.0
+
+    def _getSources(self):
+        if self._dtype == 'reuters':
+            return [path for path in SoupLoader(-1).getFiles()]
+
+        #an archive is one source, its members are streamed by the read stage
+        archive = TwentyNewsArchive.FIND('../TwentyNews/')
+        if archive != None:
+            return [archive]
+
+        sources = []
+        for directory in TwentyNewsProvider.GET_DIRECTORIES('../TwentyNews/'):
+            sources.extend([(directory.name, afile) for afile in directory.iterdir()])
+        return sources
+
+    def _read(self, source):
+        if self._dtype == 'reuters':
+            RunReport.ACTIVE().record("ingest", bytes=os.path.getsize(source))
+            with CorpusFile.OPEN(source) as f:
+                yield f.read()
+        elif isinstance(source, TwentyNewsArchive):
+            yield from source.read()
+        else:
+            category, afile = source
+            RunReport.ACTIVE().record("ingest", bytes=afile.stat().st_size)
+            with afile.open() as f:
+                yield (f.readlines(), category, afile)
+
+    def _parse(self, item) -> Iterator[Article]:
+        if self._dtype != 'reuters':
+            article = TwentyNewsProvider.PARSE(*item)
+            if article != None and (len(self._allowedCategories) == 0 or article.category in self._allowedCategories):
+                yield article
+            return
+
+        #same rules as the ReutersProvider, over all records of one file
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(item, "html.parser")
+        provider = ReutersProvider(TagListLoader(soup.find_all("reuters")))
+        while True:
+            try:
+                yield ArticleFactory.GET_NEXT_ARTICLE(provider, self._allowedCategories)
+            except OutOfArticlesError:
+                return
+
+    def _preprocess(self, article: Article) -> Iterator[Article]:
+        start = time.perf_counter()
+        article.process(self._preprocessor)
+        RunReport.ACTIVE().record("preprocess", 1, seconds=time.perf_counter() - start)
+        yield article
+
+    def __iter__(self) -> Iterator[Article]:
+        if self._started == None:
+            self._started = time.perf_counter()
+            for stage in self._stages:
+                stage.start()
+
+        while True:
+            start = time.perf_counter()
+            item = self._output.get()
+            self._consumerWaiting += time.perf_counter() - start
+
+            if item is Stage._end:
+                return
+            if isinstance(item, _Failure):
+                self.stop()
+                raise item.error
+            yield item
+
+    def stop(self) -> None:
+        #release blocked stages, e.g. when the consumer does not need all articles
+        self._stopped.set()
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started != None else 0.0
+        report = {}
+        for stage in self._stages:
+            report[stage.name] = {
+                "items": stage.items,
+                "busy": stage.busy / elapsed if elapsed > 0 else 0.0,
+                "starved": stage.starved / elapsed if elapsed > 0 else 0.0,
+                "blocked": stage.blocked / elapsed if elapsed > 0 else 0.0
+            }
+        report["consumer"] = {"waiting": self._consumerWaiting / elapsed if elapsed > 0 else 0.0}
+
+        print("----------------------------------------------")
+        print("Pipeline utilization (" + str(round(elapsed, 2)) + "s):")
+        for stage in self._stages:
+            print(stage.name + ": " + str(stage.items) + " items | busy " + str(round(report[stage.name]["busy"] * 100, 1))
+                  + "% | waiting for input " + str(round(report[stage.name]["starved"] * 100, 1))
+                  + "% | blocked by output " + str(round(report[stage.name]["blocked"] * 100, 1)) + "%")
+        print("consumer waiting: " + str(round(report["consumer"]["waiting"] * 100, 1)) + "%")
+        return report
+
+
+class PipelineProvider(AbstractProvider):
+    #provider over a prefetch pipeline, can be used everywhere a Reuters or TwentyNews provider is used
+
+    def __init__(self, pipeline: PrefetchPipeline):
+        self._pipeline = pipeline
+        self._articles = iter(pipeline)
+        self._article = None
+
+    def getPipeline(self) -> PrefetchPipeline:
+        return self._pipeline
+
+    def getNextArticle(self) -> Article:
+        #the article as it comes out of the pipeline, already preprocessed if the pipeline does so
+        self.next()
+        if not self.isValidElement():
+            raise OutOfArticlesError("No more articles found")
+        return self._article
+
+    def getCategory(self) -> str:
+        return self._article.category
+
+    def getText(self) -> str:
+        return self._article.text
+
+    def next(self):
+        self._article = next(self._articles, None)
+
+    def isValidElement(self):
+        return self._article != None
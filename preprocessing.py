@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import List, Tuple
 from collections import Counter
 
 from data import Article
@@ -8,6 +8,37 @@ class Process:
     def process(self, words: List[str]) -> List[str]:
         pass
 
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        """
+        Processes the words of many articles at once. The words of article i are
+        words[offsets[i]:offsets[i + 1]]. Falls back to process() for every single article.
+        """
+        result = []
+        newOffsets = [0]
+        for index in range(len(offsets) - 1):
+            result.extend(self.process(words[offsets[index]:offsets[index + 1]]))
+            newOffsets.append(len(result))
+        return result, newOffsets
+
+    def _mapBatch(self, words: List[str], offsets: List[int], function) -> Tuple[List[str], List[int]]:
+        """
+        Replaces every word by function(word), calling the function only once per distinct word
+        """
+        mapping = {word: function(word) for word in set(words)}
+        return [mapping[word] for word in words], offsets
+
+    def _keepBatch(self, words: List[str], offsets: List[int], keep) -> Tuple[List[str], List[int]]:
+        """
+        Keeps the words for which keep(word) is true, deciding only once per distinct word
+        """
+        decisions = {word: keep(word) for word in set(words)}
+        result = []
+        newOffsets = [0]
+        for index in range(len(offsets) - 1):
+            result.extend([word for word in words[offsets[index]:offsets[index + 1]] if decisions[word]])
+            newOffsets.append(len(result))
+        return result, newOffsets
+
 
 class Strategy:
 
@@ -297,45 +328,46 @@ class Stemmer(Process):
         indices = range(len(words))
 
         for index in indices:
-            wordMeasure = self.getMeasure(words[index])
+            words[index] = self.stem(words[index])
 
-            # Step 1 ----------------------------------------------------------
+        return words
 
-            words[index] = self.applyList(self._step1a, words[index],
-                                          wordMeasure)[0]
-            step1b = self.applyList(self._step1b, words[index], wordMeasure)
-            words[index] = step1b[0]
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        #every distinct word is stemmed once per batch
+        return self._mapBatch(words, offsets, self.stem)
 
-            if step1b[1] == 2 or step1b[1] == 3:
-                words[index] = self.applyList(self._step1bnext, words[index],
-                                              wordMeasure)[0]
+    def stem(self, word: str) -> str:
+        wordMeasure = self.getMeasure(word)
 
-            words[index] = self.applyList(self._step1c, words[index],
-                                          wordMeasure)[0]
+        # Step 1 ----------------------------------------------------------
 
-            # Step 2 ----------------------------------------------------------
+        word = self.applyList(self._step1a, word, wordMeasure)[0]
+        step1b = self.applyList(self._step1b, word, wordMeasure)
+        word = step1b[0]
 
-            words[index] = self.applyList(self._step2, words[index],
-                                          wordMeasure)[0]
+        if step1b[1] == 2 or step1b[1] == 3:
+            word = self.applyList(self._step1bnext, word, wordMeasure)[0]
 
-            # Step 3 ----------------------------------------------------------
+        word = self.applyList(self._step1c, word, wordMeasure)[0]
 
-            words[index] = self.applyList(self._step3, words[index],
-                                          wordMeasure)[0]
+        # Step 2 ----------------------------------------------------------
 
-            # Step 4 ----------------------------------------------------------
+        word = self.applyList(self._step2, word, wordMeasure)[0]
 
-            words[index] = self.applyList(self._step4, words[index],
-                                          wordMeasure)[0]
+        # Step 3 ----------------------------------------------------------
 
-            # Step 5 ----------------------------------------------------------
+        word = self.applyList(self._step3, word, wordMeasure)[0]
 
-            words[index] = self.applyList(self._step5a, words[index],
-                                          wordMeasure)[0]
-            words[index] = self.applyList(self._step5b, words[index],
-                                          wordMeasure)[0]
+        # Step 4 ----------------------------------------------------------
 
-        return words
+        word = self.applyList(self._step4, word, wordMeasure)[0]
+
+        # Step 5 ----------------------------------------------------------
+
+        word = self.applyList(self._step5a, word, wordMeasure)[0]
+        word = self.applyList(self._step5b, word, wordMeasure)[0]
+
+        return word
 
     def applyList(self, strategies, word: str, wordMeasure: int) -> str:
         #apply porter strategies
@@ -374,6 +406,10 @@ class StopwordEraser(Process):
         #only return words that are not in the stopword array
         return [word for word in words if not word in self.stopwords]
 
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        stopwords = set(self.stopwords)
+        return self._keepBatch(words, offsets, lambda word: word not in stopwords)
+
 
 class NumberEraser(Process):
     def process(self, words: List[str]) -> List[str]:
@@ -384,6 +420,10 @@ class NumberEraser(Process):
                 words[index] = "/number/"
         return words
 
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        regex = re.compile(r".*\d")
+        return self._mapBatch(words, offsets, lambda word: "/number/" if re.match(regex, word) else word)
+
 
 class GarbageEraser(Process):
 
@@ -400,6 +440,12 @@ class GarbageEraser(Process):
                 not re.match(noVocalRegex, word))
         ]
 
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        blaRegex = re.compile(self._blaRegex)
+        noVocalRegex = re.compile(self._noVocalRegex)
+        return self._keepBatch(words, offsets, lambda word: (not re.match(blaRegex, word)) and len(word) > 1 and (
+            not re.match(noVocalRegex, word)))
+
 
 class IllicitWordEraser(Process):
     def __init__(self, allowedWords: List[str]):
@@ -409,6 +455,10 @@ class IllicitWordEraser(Process):
         #return only words that are in allowedWords list
         return [word for word in words if word in self._allowedWords]
 
+    def processBatch(self, words: List[str], offsets: List[int]) -> Tuple[List[str], List[int]]:
+        allowedWords = set(self._allowedWords)
+        return self._keepBatch(words, offsets, lambda word: word in allowedWords)
+
 
 class Preprocessor:
     #regex template to test for words
@@ -417,15 +467,46 @@ class Preprocessor:
     def addProcessor(self, process: Process) -> None:
         self._processors.append(process)
 
-    def process(self, article: Article) -> Article:
-        #process the given article
+    def processWords(self, text: str) -> List[str]:
         #first: tokenization
-        words = self._tokenizer.tokenize(article.text)
+        words = self._tokenizer.tokenize(text)
 
         #all the other preprocessors
         for proc in self._processors:
             words = proc.process(words)
 
+        return words
+
+    def processWordsBatch(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        #tokenize all texts into one flat buffer, the words of text i are words[offsets[i]:offsets[i + 1]]
+        words = []
+        offsets = [0]
+        for text in texts:
+            words.extend(self._tokenizer.tokenize(text))
+            offsets.append(len(words))
+
+        #every preprocessor works on the whole batch
+        for proc in self._processors:
+            words, offsets = proc.processBatch(words, offsets)
+
+        return words, offsets
+
+    def processBatch(self, articles: List[Article]) -> List[Article]:
+        #same result as process() for every article, but each stage is called once per batch
+        words, offsets = self.processWordsBatch([article.text for article in articles])
+
+        for index, article in enumerate(articles):
+            #count the words
+            self._counter.update(words[offsets[index]:offsets[index + 1]])
+            article.preprocessed = self._counter.copy()
+            self.resetCounter()
+
+        return articles
+
+    def process(self, article: Article) -> Article:
+        #process the given article
+        words = self.processWords(article.text)
+
         #count the words
         self._counter.update(words)
 
@@ -456,16 +537,20 @@ class PreprocessorFactory:
     def FACTORY(allowedWords: List[str]) -> Preprocessor:
         # create standard Preprocessor
         if PreprocessorFactory.instance == None:
-            preprocessor = Preprocessor(allowedWords)
-            preprocessor.addProcessor(StopwordEraser())
-            preprocessor.addProcessor(NumberEraser())
-            preprocessor.addProcessor(GarbageEraser())
-            preprocessor.addProcessor(Stemmer())
-            preprocessor.addProcessor(IllicitWordEraser(allowedWords))
-            PreprocessorFactory.instance = preprocessor
-            return preprocessor
+            PreprocessorFactory.instance = PreprocessorFactory.CREATE(allowedWords)
         return PreprocessorFactory.instance
 
+    @staticmethod
+    def CREATE(allowedWords: List[str]) -> Preprocessor:
+        # create a new standard Preprocessor, not shared with anyone else
+        preprocessor = Preprocessor(allowedWords)
+        preprocessor.addProcessor(StopwordEraser())
+        preprocessor.addProcessor(NumberEraser())
+        preprocessor.addProcessor(GarbageEraser())
+        preprocessor.addProcessor(Stemmer())
+        preprocessor.addProcessor(IllicitWordEraser(allowedWords))
+        return preprocessor
+
     @staticmethod
     def CACHE_FACTORY() -> Preprocessor:
         #create a preprocessor to build the cache
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+
+class Phase:
+    #counters of one phase of a run, e.g. ingest, preprocess, fit, predict or score
+
+    def __init__(self, name: str):
+        self.name = name
+        self.documents = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.skipped = Counter()
+        #resident set size when the phase started and when it was last measured
+        self.rssStart = RunReport.CURRENT_RSS()
+        self.rssEnd = None
+        #peak of this process and of the worker processes at the end of the phase. the operating
+        #system only knows the peak of the whole lifetime, so it includes the earlier phases
+        self.peakRss = None
+        self.workerPeakRss = None
+        self.hotSpots = []
+
+    def documentsPerSecond(self) -> float:
+        return self.documents / self.seconds if self.seconds > 0 else 0.0
+
+    def toDict(self) -> dict:
+        return {
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "documentsPerSecond": self.documentsPerSecond(),
+            "skipped": dict(self.skipped),
+            "rssStart": self.rssStart,
+            "rssEnd": self.rssEnd,
+            "peakRss": self.peakRss,
+            "workerPeakRss": self.workerPeakRss,
+            "hotSpots": self.hotSpots
+        }
+
+
+class ProgressRenderer:
+    #terminal output of the progress, redrawn at most once per interval
+
+    def __init__(self, interval = 0.5, stream = sys.stderr):
+        self._interval = interval
+        self._stream = stream
+        self._last = 0.0
+
+    def render(self, name: str, count: int, total: int, started: float, force = False) -> None:
+        now = time.perf_counter()
+        #the first redraw waits one interval too, short loops stay quiet
+        if not force and now - max(self._last, started) < self._interval:
+            return
+        self._last = now
+
+        line = name + ": " + str(count)
+        if total > 0:
+            line += "/" + str(total) + " (" + str(min(100, int(100 * count / total))) + "%)"
+        if now > started:
+            line += " | " + str(round(count / (now - started), 1)) + "/s"
+        self._stream.write("\r" + line)
+        self._stream.flush()
+
+    def finish(self, name: str, count: int, total: int, started: float) -> None:
+        self.render(name, count, total, started, True)
+        self._stream.write("\n")
+        self._stream.flush()
+
+
+class RunReport:
+    #structured report of a run. phases collect documents, bytes, time, skipped articles,
+    #peak rss and allocation hot spots, the whole report is written as json
+
+    _active = None
+
+    def __init__(self, name: str, renderer: Optional[ProgressRenderer] = None,
+                 traceAllocations = False, hotSpots = 5, progress = True):
+        self._name = name
+        #every report draws on its own renderer, progress = False turns the output off
+        if renderer == None and progress:
+            renderer = ProgressRenderer()
+        self._renderer = renderer
+        self._traceAllocations = traceAllocations
+        self._hotSpots = hotSpots
+        self._phases = {}
+        self._progress = {}
+        self._started = time.time()
+        #the prefetch pipeline records from its worker threads
+        self._lock = threading.Lock()
+
+        if traceAllocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @staticmethod
+    def ACTIVE() -> RunReport:
+        #report of the current run, library code records into it
+        if RunReport._active == None:
+            RunReport._active = RunReport("default")
+        return RunReport._active
+
+    @staticmethod
+    def START(name: str, renderer: Optional[ProgressRenderer] = None,
+              traceAllocations = False, progress = True) -> RunReport:
+        RunReport._active = RunReport(name, renderer, traceAllocations, progress=progress)
+        return RunReport._active
+
+    def getPhase(self, name: str) -> Phase:
+        with self._lock:
+            if name not in self._phases:
+                self._phases[name] = Phase(name)
+            return self._phases[name]
+
+    def record(self, name: str, documents = 0, bytes = 0, seconds = 0.0) -> None:
+        phase = self.getPhase(name)
+        with self._lock:
+            phase.documents += documents
+            phase.bytes += bytes
+            phase.seconds += seconds
+
+    def skip(self, name: str, reason: str, count = 1) -> None:
+        phase = self.getPhase(name)
+        with self._lock:
+            phase.skipped[reason] += count
+
+    @staticmethod
+    def PEAK_RSS() -> Optional[int]:
+        #peak resident set size of the process so far, in bytes
+        try:
+            import resource
+        except ImportError:
+            return None
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        #linux reports kilobytes, macos bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    @staticmethod
+    def CURRENT_RSS() -> Optional[int]:
+        #current resident set size of the process in bytes, only known on linux
+        try:
+            with open("/proc/self/statm", "r") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def measure(self, name: str, workerPeakRss: Optional[int] = None) -> None:
+        #memory at the end of a phase. workers report their own peak, e.g. the fits of the experiments
+        phase = self.getPhase(name)
+        phase.rssEnd = RunReport.CURRENT_RSS()
+        phase.peakRss = RunReport.PEAK_RSS()
+        if workerPeakRss != None:
+            phase.workerPeakRss = max(phase.workerPeakRss or 0, workerPeakRss)
+
+        if self._traceAllocations and tracemalloc.is_tracing():
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:self._hotSpots]
+            phase.hotSpots = [{"location": str(statistic.traceback), "bytes": statistic.size,
+                               "allocations": statistic.count} for statistic in statistics]
+
+    @contextmanager
+    def phase(self, name: str, documents = 0):
+        #times a coarse phase, use record for phases interleaved with others
+        self.getPhase(name)
+        start = time.perf_counter()
+        try:
+            yield self.getPhase(name)
+        finally:
+            self.record(name, documents, seconds=time.perf_counter() - start)
+            self.measure(name)
+
+    def progress(self, message: str, total = 0) -> None:
+        #one more item done, replaces the progress bars
+        if message not in self._progress:
+            self._progress[message] = [0, time.perf_counter()]
+        self._progress[message][0] += 1
+
+        if self._renderer != None:
+            count, started = self._progress[message]
+            self._renderer.render(message, count, total, started)
+
+    def finishProgress(self, message: str, total = 0) -> int:
+        #returns the number of items
+        count, started = self._progress.pop(message, [0, time.perf_counter()])
+        if self._renderer != None:
+            self._renderer.finish(message, count, total, started)
+        return count
+
+    def toDict(self) -> dict:
+        return {
+            "name": self._name,
+            "started": self._started,
+            "seconds": time.time() - self._started,
+            "peakRss": RunReport.PEAK_RSS(),
+            "phases": {name: phase.toDict() for name, phase in self._phases.items()}
+        }
+
+    def write(self, path = "report.json") -> None:
+        file = open(path, "w+")
+        file.write(json.dumps(self.toDict(), indent=2))
+        file.close()
+
+    def print(self) -> None:
+        print("----------------------------------------------")
+        print("phase | documents | documents/s | bytes | skipped")
+        for name, phase in self._phases.items():
+            skipped = ", ".join([reason + ": " + str(count) for reason, count in phase.skipped.items()])
+            print(name + " | " + str(phase.documents) + " | " + str(round(phase.documentsPerSecond(), 1))
+                  + " | " + str(phase.bytes) + " | " + (skipped if skipped != "" else "-"))
@@ -7,6 +7,12 @@ do
     echo "-----------------------------------"
     echo "\"svm\"  | to run SVM experiments"
     echo "\"grid\" | to run SVM GridSearch."
+    echo "\"cv\" | to run stratified k-fold cross validation."
+    echo "\"stream\" | to run SVM experiments on a batch stream (out-of-core)."
+    echo "\"bench\" | to run the engine benchmarks."
+    echo "\"load\" | to measure classification latency under concurrent load."
+    echo "\"index\" | to build the byte offset index of the Reuters corpus."
+    echo "\"worker\" | to start a warm worker (query it with workerMain.py)."
     echo "\"exit\" | to exit."
 
     read var1
@@ -30,6 +36,42 @@ do
         python svmMain.py
     fi
 
+    if [ "$var1" == "cv" ]
+    then
+        echo "running cross validation"
+        python cvMain.py
+    fi
+
+    if [ "$var1" == "stream" ]
+    then
+        echo "running streaming SVM experiments"
+        python streamMain.py
+    fi
+
+    if [ "$var1" == "bench" ]
+    then
+        echo "running benchmarks"
+        python benchmarkMain.py
+    fi
+
+    if [ "$var1" == "load" ]
+    then
+        echo "running load generator"
+        python loadgenMain.py
+    fi
+
+    if [ "$var1" == "index" ]
+    then
+        echo "indexing Reuters corpus"
+        python indexMain.py
+    fi
+
+    if [ "$var1" == "worker" ]
+    then
+        echo "starting warm worker"
+        python workerMain.py serve
+    fi
+
     echo " "
     echo " "
 done
@@ -0,0 +1,36 @@
+import time
+from svm import StreamingSVMWrapper
+from cache import Cache
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+dtype = 'reuters'
+#dtype = 'twentyNews'
+
+cache = Cache(dtype)
+
+print("----------------------------------------------")
+print("start streaming SVM, all Categories, with params: ")
+print(cache.bestParamsLarge)
+
+wrapper = StreamingSVMWrapper(-1, dtype)
+wrapper.processStream(cache.bestParamsLarge, False)
+
+print("----------------------------------------------")
+print("start streaming SVM, Categories >= 200 Articles, with params: ")
+print(cache.bestParamsSmall)
+
+wrapper = StreamingSVMWrapper(7, dtype)
+wrapper.processStream(cache.bestParamsSmall, False)
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------
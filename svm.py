@@ -1,22 +1,30 @@
-import numpy as np
-from progress.bar import ChargingBar
-from sklearn.svm import SVC
-from sklearn.metrics import accuracy_score, recall_score, precision_score
+import time
+from collections import deque
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from cache import Cache
-from data import SetFactory
+from compact import CompactModel
+from data import Article, SetFactory
+from engines import EngineFactory, EngineTuner
+from lazy import LazyModule
 from preprocessing import PreprocessorFactory
+from report import RunReport
+
+np = LazyModule("numpy")
 
 
 class SVMWrapper:
 
-    def __init__(self, limitCategories = -1, dtype = 'reuters'):
+    def __init__(self, limitCategories = -1, dtype = 'reuters', store = None, deduplicator = None, prefetch = False):
         #init cache
         self._cache = Cache()
 
         #get preprocessors
         preprocessor = PreprocessorFactory.FACTORY(list(
             self._cache.words.keys()))
+        self._preprocessor = preprocessor
+        self._svm = None
 
         #check if categories are limites
         if limitCategories > 0:
@@ -25,53 +33,351 @@ class SVMWrapper:
         else:
             categories = []
 
-        #get the dataset
-        self._dataSet = SetFactory.PREPARE_DATASET(int(self._cache.articleCount / 2), preprocessor,
-            self._cache.articleCount, categories, dtype=dtype)
+        #get the dataset, from a shared feature store if there is one.
+        #prefetch reads, parses and preprocesses the corpus in background threads
+        if store != None:
+            self._dataSet = SetFactory.SPLIT(store, int(self._cache.articleCount / 2), categories)
+        else:
+            self._dataSet = SetFactory.PREPARE_DATASET(int(self._cache.articleCount / 2), preprocessor,
+                self._cache.articleCount, categories, dtype=dtype, prefetch=prefetch,
+                deduplicator=deduplicator)
 
     def getDataset(self):
         return self._dataSet
 
-    def processDataset(self,  bestParams, verbose: bool):
+    def getModel(self):
+        return self._svm
+
+    def exportModel(self, path, dtype = 'float32') -> CompactModel:
+        #sparse, quantized copy of the fitted svm for fast loading and low memory serving
+        if not hasattr(self._svm, "support_vectors_"):
+            raise ValueError("Only exact SVC models can be exported.")
+
+        model = CompactModel.EXPORT(self._svm, dtype)
+        model.save(path)
+        return model
+
+    def compareCompact(self, bestParams):
+        #fit the exact svm and compare it with its compact exports on the test set
+        self.processDataset(bestParams, False)
+        return CompactModel.COMPARE(self._svm, self._dataSet[1].getTextArray(), self._dataSet[1].getCategories())
+
+    def saveModel(self, path) -> None:
+        #lossless copy of the fitted svm, it can be loaded and updated later
+        self.exportModel(path, 'float64')
+
+    def loadModel(self, path) -> CompactModel:
+        self._svm = CompactModel.LOAD(path)
+        return self._svm
+
+    def updateModel(self, vectors, categories):
+        #retrain on the support vectors of the current model plus the new articles. all other
+        #training articles were outside the margin, so leaving them out barely changes the solution
+        if isinstance(self._svm, CompactModel):
+            model = self._svm
+        elif hasattr(self._svm, "support_vectors_"):
+            model = CompactModel.EXPORT(self._svm, 'float64')
+        else:
+            raise ValueError("Only exact SVC models can be updated.")
+
+        supportVectors, supportCategories = model.getSupportVectors()
+        features = np.vstack([supportVectors, np.asarray(vectors, dtype=np.float64)])
+        labels = np.concatenate([supportCategories.astype(str), np.asarray(categories).astype(str)])
+
+        svm = EngineFactory.SVC(model.params)
+        svm.fit(features, labels)
+        self._svm = svm
+        return svm
+
+    def updateModelWithTexts(self, texts: List[str], categories: List[str]):
+        vectors = [self._preprocessor.process(Article(text, category)).normalized
+                   for text, category in zip(texts, categories)]
+        return self.updateModel(vectors, categories)
+
+    def compareUpdate(self, bestParams, initialShare = 0.5, batches = 4):
+        #train on the first part of the training set, add the rest in batches with updateModel
+        #and compare against one full retrain on the whole training set
+        features = np.asarray(self._dataSet[0].getTextArray(), dtype=np.float64)
+        categories = np.asarray(self._dataSet[0].getCategories()).astype(str)
+        testFeatures = self._dataSet[1].getTextArray()
+        testCategories = self._dataSet[1].getCategories()
+
+        initial = int(len(categories) * initialShare)
+        self._svm = EngineFactory.SVC(bestParams).fit(features[:initial], categories[:initial])
+
+        updateTime = 0.0
+        for batch in np.array_split(np.arange(initial, len(categories)), batches):
+            start = time.perf_counter()
+            self.updateModel(features[batch], categories[batch])
+            updateTime += time.perf_counter() - start
+        updated = self._svm.predict(testFeatures)
+
+        start = time.perf_counter()
+        full = EngineFactory.SVC(bestParams).fit(features, categories)
+        fullTime = time.perf_counter() - start
+        retrained = full.predict(testFeatures)
+
+        updatedScores = Scores.CALCULATE(testCategories, updated)
+        retrainedScores = Scores.CALCULATE(testCategories, retrained)
+
+        print("----------------------------------------------")
+        print("model | fit time | accuracy")
+        print("full retrain | " + str(round(fullTime, 3)) + "s | " + str(round(retrainedScores["accuracy"], 4)))
+        print(str(batches) + " updates | " + str(round(updateTime, 3)) + "s | " + str(round(updatedScores["accuracy"], 4)))
+        #each update replaces one full retrain
+        print("Speedup per update: " + str(fullTime * batches / updateTime if updateTime > 0 else 0.0))
+        print("Accuracy drift: " + str(updatedScores["accuracy"] - retrainedScores["accuracy"]))
+        print("Agreement with full retrain: " + str(float(np.mean(updated == retrained))))
+        return retrainedScores, updatedScores
+
+    def classify(self, texts: List[str]) -> List[str]:
+        #preprocess new texts like the dataset and predict their categories with the fitted svm
+        vectors = [self._preprocessor.process(Article(text, "unknown")).normalized for text in texts]
+        return [str(category) for category in self._svm.predict(vectors)]
+
+    def scoreTopK(self, vectors: Iterable, k = 3, chunkSize = 1000) -> Iterator[List[Tuple[str, float]]]:
+        #yields the k best categories and their scores for every document, best first.
+        #the decision function runs chunk by chunk, so memory is bounded by the chunk size
+        classes = np.asarray(self._svm.classes_)
+        k = min(k, len(classes))
+        vectors = iter(vectors)
+
+        chunk = list(islice(vectors, chunkSize))
+        while len(chunk) > 0:
+            scores = np.asarray(self._svm.decision_function(np.asarray(chunk, dtype=np.float64)))
+            #binary svms return one column, positive values mean the second class
+            if scores.ndim == 1:
+                scores = np.column_stack([-scores, scores])
+
+            #partial sort, only the k best columns are ordered
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            bestScores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-bestScores, axis=1, kind='stable')
+            best = np.take_along_axis(best, order, axis=1)
+            bestScores = np.take_along_axis(bestScores, order, axis=1)
+
+            for labels, values in zip(classes[best], bestScores):
+                yield [(str(label), float(value)) for label, value in zip(labels, values)]
+            chunk = list(islice(vectors, chunkSize))
+
+    def classifyTopK(self, texts: Iterable[str], k = 3, chunkSize = 1000) -> Iterator[List[Tuple[str, float]]]:
+        #like classify, but with the k best categories per text. texts are preprocessed lazily
+        vectors = (self._preprocessor.process(Article(text, "unknown")).normalized for text in texts)
+        return self.scoreTopK(vectors, k, chunkSize)
+
+    def evaluateTopK(self, k = 3, chunkSize = 1000) -> List[float]:
+        #share of test articles whose category is among the first 1..k predictions
+        categories = self._dataSet[1].getCategories()
+        hits = [0] * k
+        for category, predictions in zip(categories, self.scoreTopK(self._dataSet[1].getTextArray(), k, chunkSize)):
+            labels = [label for label, _ in predictions]
+            for rank in range(k):
+                if str(category) in labels[:rank + 1]:
+                    hits[rank] += 1
+
+        accuracies = [hit / len(categories) for hit in hits]
+        for rank, accuracy in enumerate(accuracies):
+            print("Top-" + str(rank + 1) + " accuracy: " + str(accuracy))
+        return accuracies
+
+    def processDataset(self,  bestParams, verbose: bool, engine = 'exact', nJobs = -1, components = 1000,
+                       timeBudget = -1, memoryBudget = -1):
         #local reference for performance reasons
         dataSet = self._dataSet
 
-        #check for degree, wich is not in the array for most kernels
-        if 'degree' in bestParams:
-            #init svm
-            svm = SVC(kernel=bestParams["kernel"], C=bestParams["C"], degree=bestParams["degree"], gamma=bestParams["gamma"],
-                        coef0=0.1, shrinking=True, decision_function_shape="ovr",
-                        tol=0.001, cache_size=200, verbose=False, max_iter=-1)
-        else:
-            #init svm
-            svm = SVC(kernel=bestParams["kernel"], C=bestParams["C"], gamma=bestParams["gamma"],
-                        coef0=0.1, shrinking=True, decision_function_shape="ovr",
-                        tol=0.001, cache_size=200, verbose=False, max_iter=-1)
+        #choose engine and kernel cache for the data and the budgets
+        cacheSize = 200
+        if engine == 'auto':
+            decision = EngineTuner(timeBudget, memoryBudget, components=components).tune(
+                bestParams, dataSet[0].getTextArray(), dataSet[0].getCategories())
+            engine = decision["engine"]
+            components = decision["components"]
+            cacheSize = decision["cacheSize"]
+
+        #init svm
+        svm = EngineFactory.FACTORY(bestParams, engine, nJobs, components, cacheSize)
+
+        #worker pools attach to the memory mapped training set instead of copying it
+        if engine == 'ovr':
+            dataSet[0].spill()
+
+        report = RunReport.ACTIVE()
 
         print("fitting SVM ...")
-        svm.fit(dataSet[0].getTextArray(), dataSet[0].getCategories())
+        start = time.perf_counter()
+        with report.phase("fit", len(dataSet[0])):
+            svm.fit(dataSet[0].getTextArray(), dataSet[0].getCategories())
+        fitTime = time.perf_counter() - start
+        self._svm = svm
 
         print("testing SVM ...")
 
+        #get svm scores
+        with report.phase("predict", len(dataSet[1])):
+            predicted = svm.predict(dataSet[1].getTextArray())
+        with report.phase("score", len(dataSet[1])):
+            scores = Scores.CALCULATE(dataSet[1].getCategories(), predicted)
+        scores["fitTime"] = fitTime
+
+        Scores.PRINT(scores)
+        return scores
+
+    def compareOvR(self, bestParams, nJobs = -1):
+        #train the current SVC and the parallel one-vs-rest engine on the same data
+        print("----------------------------------------------")
+        print("exact SVC:")
+        exact = self.processDataset(bestParams, False)
+        print("----------------------------------------------")
+        print("parallel one-vs-rest:")
+        ovr = self.processDataset(bestParams, False, 'ovr', nJobs)
+
+        print("----------------------------------------------")
+        print("Fit time SVC: " + str(exact["fitTime"]) + "s")
+        print("Fit time OvR: " + str(ovr["fitTime"]) + "s")
+        print("Speedup: " + str(exact["fitTime"] / ovr["fitTime"]))
+        return exact, ovr
+
+    def compareKernelApproximation(self, bestParams, components = [250, 500, 1000, 2000]):
+        #exact kernel against approximate feature maps of different sizes
+        results = [("exact", "-", self.processDataset(bestParams, False))]
+        for engine in ['nystroem', 'fourier']:
+            for count in components:
+                print("----------------------------------------------")
+                print(engine + ", " + str(count) + " components:")
+                results.append((engine, str(count), self.processDataset(bestParams, False, engine, components=count)))
+
+        print("----------------------------------------------")
+        print("engine | components | accuracy | fit time")
+        for engine, count, scores in results:
+            print(engine + " | " + count + " | " + str(round(scores["accuracy"], 4))
+                  + " | " + str(round(scores["fitTime"], 3)) + "s")
+        return results
+
+
+class Scores:
+
+    @staticmethod
+    def CALCULATE(trueCategories, predicted) -> dict:
+        from sklearn.metrics import accuracy_score, recall_score, precision_score
+
         #------------------------------------------------------------------------------
         #get svm scores
-        predicted = svm.predict(dataSet[1].getTextArray())
-        #meanAcc = svm.score(dataSet[1].getTextArray(),
-        #                    dataSet[1].getCategories())
-        accuracy = accuracy_score(dataSet[1].getCategories(), predicted)
-        recall = recall_score(dataSet[1].getCategories(), predicted, average='macro')
-        precision = precision_score(dataSet[1].getCategories(), predicted, average='macro')
-        
-        wRecall = recall_score(dataSet[1].getCategories(), predicted, average='weighted')
-        wPrecision = precision_score(dataSet[1].getCategories(), predicted, average='weighted')
+        scores = {}
+        scores["accuracy"] = accuracy_score(trueCategories, predicted)
+        scores["recall"] = recall_score(trueCategories, predicted, average='macro')
+        scores["precision"] = precision_score(trueCategories, predicted, average='macro')
+
+        scores["weightedRecall"] = recall_score(trueCategories, predicted, average='weighted')
+        scores["weightedPrecision"] = precision_score(trueCategories, predicted, average='weighted')
         #------------------------------------------------------------------------------
+        return scores
+
+    @staticmethod
+    def PRINT(scores: dict) -> None:
+        print(
+            "######################################################################"
+        )
+        print("Accuracy: " + str(scores["accuracy"]))
+        print("Recall: " + str(scores["recall"]))
+        print("Precision: " + str(scores["precision"]))
+        print("Weighted recall: " + str(scores["weightedRecall"]))
+        print("Weighted precision: " + str(scores["weightedPrecision"]))
+        if "fitTime" in scores:
+            print("Fit time: " + str(scores["fitTime"]) + "s")
+
+    @staticmethod
+    def SUMMARIZE(scores: List[dict]) -> dict:
+        #mean and variance of every metric over several runs, e.g. the folds of a cross validation
+        summary = {}
+        for metric in scores[0]:
+            values = np.array([run[metric] for run in scores], dtype=np.float64)
+            summary[metric] = {"mean": float(values.mean()), "variance": float(values.var(ddof=1)) if len(values) > 1 else 0.0}
+        return summary
 
+    @staticmethod
+    def PRINT_SUMMARY(summary: dict, runs: int) -> None:
         print(
             "######################################################################"
         )
-        #print("Mean Accuracy: " + str(meanAcc))
-        print("Accuracy: " + str(accuracy))
-        print("Recall: " + str(recall))
-        print("Precision: " + str(precision))
-        print("Weighted recall: " + str(wRecall))
-        print("Weighted precision: " + str(wPrecision))
+        print("Mean and variance over " + str(runs) + " runs")
+        for metric, name in [("accuracy", "Accuracy"), ("recall", "Recall"), ("precision", "Precision"),
+                             ("weightedRecall", "Weighted recall"), ("weightedPrecision", "Weighted precision"),
+                             ("fitTime", "Fit time")]:
+            if metric in summary:
+                print(name + ": " + str(summary[metric]["mean"]) + " | variance: " + str(summary[metric]["variance"]))
+
+
+class StreamingSVMWrapper:
+
+    def __init__(self, limitCategories = -1, dtype = 'reuters', batchSize = 500,
+                 holdoutEvery = 2, maxHeldOut = 2000):
+        #init cache
+        self._cache = Cache()
+        self._dtype = dtype
+
+        #get preprocessors
+        self._preprocessor = PreprocessorFactory.FACTORY(list(
+            self._cache.words.keys()))
+
+        #check if categories are limited
+        if limitCategories > 0:
+            self._categories = [item[0] for item in list(self._cache.categories.most_common(limitCategories))]
+        else:
+            self._categories = []
+
+        #every n-th batch is held out for evaluation instead of training
+        self._batchSize = batchSize
+        self._holdoutEvery = holdoutEvery
+        #the held out stream is bounded, only the newest articles are kept
+        self._heldOut = deque(maxlen=maxHeldOut)
+
+    def _evaluate(self, model):
+        vectors = [item[0] for item in self._heldOut]
+        categories = [item[1] for item in self._heldOut]
+        return Scores.CALCULATE(categories, model.predict(vectors))
+
+    def processStream(self, bestParams, verbose: bool, evaluateEvery = 5) -> Optional[dict]:
+        #every run holds out its own articles
+        self._heldOut.clear()
+
+        #partial_fit needs all possible classes on the first call
+        if self._categories:
+            classes = list(self._categories)
+        else:
+            classes = list(self._cache.categories.keys())
+
+        from sklearn.linear_model import SGDClassifier
+
+        #linear svm trained by stochastic gradient descent
+        #alpha mirrors C of the SVC, scaled by the expected number of training articles
+        model = SGDClassifier(loss="hinge", alpha=1.0 / (bestParams["C"] * self._cache.articleCount),
+                              tol=0.001, max_iter=1000)
+
+        print("fitting SVM on stream ...")
+        trained = 0
+        for index, batch in enumerate(SetFactory.STREAM_BATCHES(self._batchSize,
+                self._preprocessor, allowedCategories=self._categories, dtype=self._dtype)):
+            #held out batch, keep it for evaluation. the first batch is always trained on
+            if (index + 1) % self._holdoutEvery == 0 and trained > 0:
+                self._heldOut.extend(zip(batch.getTextArray(), batch.getCategories()))
+                continue
+
+            model.partial_fit(batch.getTextArray(), batch.getCategories(), classes=classes)
+            trained += 1
+
+            #periodic evaluation on the held out stream
+            if trained % evaluateEvery == 0 and len(self._heldOut) > 0:
+                scores = self._evaluate(model)
+                print("Batches: " + str(trained) + " | Accuracy: " + str(scores["accuracy"]))
+
+        #an empty stream or one of a single batch leaves nothing to test on
+        if len(self._heldOut) == 0:
+            print("stream too short to test the SVM: " + str(trained) + " batches trained, "
+                  + str(len(self._heldOut)) + " articles held out")
+            return None
+
+        print("testing SVM ...")
+        scores = self._evaluate(model)
+
+        Scores.PRINT(scores)
+        return scores
@@ -1,5 +1,6 @@
 import time
-from svm import SVMWrapper
+from experiment import ExperimentRunner
+from report import RunReport
 from cache import Cache
 from preprocessing import PreprocessorFactory
 from collections import Counter
@@ -11,6 +12,9 @@ current_milli_time = lambda: int(round(time.time() * 1000))
 millis = current_milli_time()
 #------------------------------------------------------------
 
+#machine readable report of the run, set traceAllocations for allocation hot spots
+report = RunReport.START("svmMain")
+
 dtype = 'reuters'
 #dtype = 'twentyNews'
 
@@ -21,19 +25,14 @@ print("Categories > 200 Articles")
 print([cat for cat in cache.categories if (cache.categories[cat] > 200)])
 print("----------------------------------------------")
 
-print("----------------------------------------------")
-print("start SVM, all Categories, with params: ")
-print(cache.bestParamsLarge)
-
-wrapper = SVMWrapper(-1, dtype)
-wrapper.processDataset(cache.bestParamsLarge, False)
-
-print("----------------------------------------------")
-print("start SVM, Categories >= 200 Articles, with params: ")
-print(cache.bestParamsSmall)
+#preprocess once, both experiments are row selections on the same feature store
+runner = ExperimentRunner(dtype)
+runner.addExperiment("SVM, all Categories", -1, cache.bestParamsLarge)
+runner.addExperiment("SVM, Categories >= 200 Articles", 7, cache.bestParamsSmall)
+runner.run()
 
-wrapper = SVMWrapper(7, dtype)
-wrapper.processDataset(cache.bestParamsSmall, False)
+report.print()
+report.write("report.json")
 
 #------------------------------------------------------------
 #end timing
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from collections import Counter
+from typing import Iterable, Tuple
+
+from lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+class CountMinSketch:
+    #approximate counter with fixed memory. estimates never undercount
+
+    def __init__(self, width = 2 ** 20, depth = 4):
+        self._width = width
+        self._depth = depth
+        self._rows = np.arange(depth)
+        self._table = np.zeros((depth, width), dtype=np.int64)
+
+    def _indices(self, word: str) -> np.ndarray:
+        #derive all row hashes from one digest (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return np.array([(first + row * second) % self._width for row in range(self._depth)])
+
+    def add(self, word: str, count = 1) -> int:
+        #add to the counter and return the new estimate
+        indices = self._indices(word)
+        self._table[self._rows, indices] += count
+        return int(self._table[self._rows, indices].min())
+
+    def estimate(self, word: str) -> int:
+        return int(self._table[self._rows, self._indices(word)].min())
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        if self._table.shape != other._table.shape:
+            raise ValueError("Sketches must have the same width and depth to be merged.")
+        self._table += other._table
+
+
+class VocabularyBuilder:
+    #first pass: sketch term frequencies, remember words that may pass the thresholds.
+    #second pass: count the remaining candidates exactly and crop them.
+    #the document frequency of a word is the number of articles since its first occurance, like the
+    #counter of the cache preprocessor keeps every word it has seen (see Cache.analyzeArticles)
+
+    def __init__(self, minTermFrequency = 10, maxTermFrequency = 10000, minDocumentFrequency = 11,
+                 maxDocumentFrequency = -1, shards = 1, width = 2 ** 20, depth = 4):
+        self._minTermFrequency = minTermFrequency
+        self._maxTermFrequency = maxTermFrequency
+        self._minDocumentFrequency = minDocumentFrequency
+        self._maxDocumentFrequency = maxDocumentFrequency
+
+        #when the corpus is split into shards, a word passing the threshold in total
+        #passes the lowered threshold in at least one shard
+        self._termThreshold = max(1, math.ceil(minTermFrequency / shards))
+
+        self._terms = CountMinSketch(width, depth)
+        self._candidates = {}
+        self._articleCount = 0
+
+    @property
+    def articleCount(self) -> int:
+        return self._articleCount
+
+    @property
+    def candidates(self) -> list:
+        return list(self._candidates.keys())
+
+    def add(self, words: Counter) -> None:
+        #add the word counts of one article. the document frequency depends on the first occurance,
+        #which is only known after the second pass, so candidates are chosen by term frequency
+        for word, count in words.items():
+            if count <= 0:
+                continue
+
+            if self._terms.add(word, count) >= self._termThreshold:
+                self._candidates[word] = None
+
+        self._articleCount += 1
+
+    def merge(self, other: 'VocabularyBuilder') -> None:
+        #merge the partial counts of another worker
+        self._terms.merge(other._terms)
+        self._candidates.update(other._candidates)
+        self._articleCount += other._articleCount
+
+    def count(self, articles: Iterable[Counter], offset = 0) -> Tuple[Counter, dict]:
+        #exact term frequencies and the index of the first article of the candidates only.
+        #offset is the index of the first article, partial results of several workers are merged
+        #by adding the terms and keeping the smallest first index
+        terms = Counter()
+        first = {}
+        for index, words in enumerate(articles):
+            for word, count in words.items():
+                if count > 0 and word in self._candidates:
+                    terms[word] += count
+                    if word not in first:
+                        first[word] = offset + index
+        return terms, first
+
+    def crop(self, terms: Counter, first: dict) -> Counter:
+        result = Counter()
+        #in the order of the first occurance, like the full analysis
+        for word in sorted(first, key=first.get):
+            documents = self._articleCount - first[word]
+            #check if word is within acceptable bounds
+            if terms[word] < self._minTermFrequency or terms[word] >= self._maxTermFrequency:
+                continue
+            if documents < self._minDocumentFrequency:
+                continue
+            if self._maxDocumentFrequency > 0 and documents > self._maxDocumentFrequency:
+                continue
+            result[word] = 0
+
+        #print 10 most common words
+        print(terms.most_common(10))
+
+        print("Total word count: " + str(len(result)))
+        return result
+
+    def finalize(self, articles: Iterable[Counter]) -> Counter:
+        return self.crop(*self.count(articles))
@@ -0,0 +1,130 @@
+import json
+import os
+import secrets
+from multiprocessing.connection import Client, Listener
+
+from cache import Cache
+from svm import SVMWrapper
+
+
+class WarmWorker:
+    #keeps the cache, the preprocessor, prepared datasets and fitted models resident and
+    #serves requests over a local socket, so repeated invocations skip the cold start.
+    #every serve generates a new key, only readable by the user, and messages are plain json
+
+    _address = ('localhost', 6070)
+    _keyFile = "worker.key"
+
+    def __init__(self, dtype = 'reuters'):
+        self._dtype = dtype
+        self._cache = Cache(dtype)
+        self._wrappers = {}
+
+    def _getWrapper(self, limitCategories) -> SVMWrapper:
+        #datasets are only prepared once per category limit
+        if limitCategories not in self._wrappers:
+            self._wrappers[limitCategories] = SVMWrapper(limitCategories, self._dtype)
+        return self._wrappers[limitCategories]
+
+    def _getParams(self, request: dict):
+        if "bestParams" in request:
+            return request["bestParams"]
+        if request.get("limitCategories", -1) > 0:
+            return self._cache.bestParamsSmall
+        return self._cache.bestParamsLarge
+
+    def handle(self, request: dict) -> dict:
+        command = request.get("command")
+        if command == "categories":
+            return {"categories": dict(self._cache.categories)}
+
+        wrapper = self._getWrapper(request.get("limitCategories", -1))
+        if command == "experiment":
+            return {"scores": wrapper.processDataset(self._getParams(request), False,
+                                                     request.get("engine", "exact"))}
+
+        if command == "classify":
+            #fit once, later requests reuse the resident model
+            if wrapper.getModel() == None:
+                wrapper.processDataset(self._getParams(request), False)
+            return {"categories": wrapper.classify(request["texts"])}
+
+        raise ValueError("Unknown command: " + str(command))
+
+    @staticmethod
+    def _writeKey() -> bytes:
+        key = secrets.token_bytes(32)
+        #create the file with owner only permissions, never readable by others in between
+        if os.path.exists(WarmWorker._keyFile):
+            os.remove(WarmWorker._keyFile)
+        descriptor = os.open(WarmWorker._keyFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(key)
+        return key
+
+    @staticmethod
+    def _readKey() -> bytes:
+        try:
+            with open(WarmWorker._keyFile, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            raise RuntimeError("No warm worker running, start one with: python workerMain.py serve")
+
+    @staticmethod
+    def _send(connection, message: dict) -> None:
+        connection.send_bytes(json.dumps(message).encode('utf-8'))
+
+    @staticmethod
+    def _receive(connection) -> dict:
+        #json instead of pickle, a message can never run code
+        message = json.loads(connection.recv_bytes().decode('utf-8'))
+        if not isinstance(message, dict):
+            raise ValueError("expected an object, got " + type(message).__name__)
+        return message
+
+    def serve(self) -> None:
+        key = WarmWorker._writeKey()
+        try:
+            with Listener(self._address, authkey=key) as listener:
+                print("warm worker listening on " + str(self._address))
+                while True:
+                    try:
+                        connection = listener.accept()
+                    except Exception as error:
+                        #failed handshake, e.g. a client with a wrong key
+                        print("rejected connection: " + type(error).__name__)
+                        continue
+
+                    #a bad request or a lost client must never end the worker
+                    with connection:
+                        try:
+                            try:
+                                request = WarmWorker._receive(connection)
+                            except ValueError as error:
+                                WarmWorker._send(connection, {"error": "Invalid request: " + str(error)})
+                                continue
+
+                            if request.get("command") == "shutdown":
+                                WarmWorker._send(connection, {"shutdown": True})
+                                return
+
+                            try:
+                                response = self.handle(request)
+                            except Exception as error:
+                                response = {"error": type(error).__name__ + ": " + str(error)}
+                            WarmWorker._send(connection, response)
+                        except (EOFError, OSError) as error:
+                            print("lost connection: " + type(error).__name__)
+        finally:
+            os.remove(WarmWorker._keyFile)
+
+    @staticmethod
+    def REQUEST(request: dict) -> dict:
+        #send a request to a running warm worker
+        with Client(WarmWorker._address, authkey=WarmWorker._readKey()) as connection:
+            WarmWorker._send(connection, request)
+            response = WarmWorker._receive(connection)
+
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
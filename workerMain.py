@@ -0,0 +1,37 @@
+import sys
+import time
+from worker import WarmWorker
+
+current_milli_time = lambda: int(round(time.time() * 1000))
+
+#------------------------------------------------------------
+#start timing
+millis = current_milli_time()
+#------------------------------------------------------------
+
+dtype = 'reuters'
+#dtype = 'twentyNews'
+
+#usage:
+#python workerMain.py serve
+#python workerMain.py categories
+#python workerMain.py experiment <limitCategories>
+#python workerMain.py classify <limitCategories> <text> ...
+#python workerMain.py shutdown
+command = sys.argv[1] if len(sys.argv) > 1 else "serve"
+
+if command == "serve":
+    WarmWorker(dtype).serve()
+elif command == "experiment":
+    print(WarmWorker.REQUEST({"command": command, "limitCategories": int(sys.argv[2])}))
+elif command == "classify":
+    print(WarmWorker.REQUEST({"command": command, "limitCategories": int(sys.argv[2]), "texts": sys.argv[3:]}))
+else:
+    print(WarmWorker.REQUEST({"command": command}))
+
+#------------------------------------------------------------
+#end timing
+print("-----------------------------------------------")
+print("Time: " + str(current_milli_time() - millis))
+print("-----------------------------------------------")
+#------------------------------------------------------------